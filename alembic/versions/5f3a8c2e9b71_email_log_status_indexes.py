@@ -0,0 +1,30 @@
+"""email log status indexes
+
+Revision ID: 5f3a8c2e9b71
+Revises: 9e2b7d4c1a06
+Create Date: 2026-10-18 15:22:40.517903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f3a8c2e9b71'
+down_revision: Union[str, Sequence[str], None] = '9e2b7d4c1a06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_email_logs_status_sent_at', 'email_logs', ['status', 'sent_at'], unique=False)
+    op.create_index('ix_email_logs_email_sent_at', 'email_logs', ['email', 'sent_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_email_logs_email_sent_at', table_name='email_logs')
+    op.drop_index('ix_email_logs_status_sent_at', table_name='email_logs')
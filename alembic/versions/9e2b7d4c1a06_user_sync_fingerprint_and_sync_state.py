@@ -0,0 +1,36 @@
+"""user sync fingerprint and sync state
+
+Revision ID: 9e2b7d4c1a06
+Revises: d81f3a6c5e20
+Create Date: 2026-10-18 12:41:52.118304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e2b7d4c1a06'
+down_revision: Union[str, Sequence[str], None] = 'd81f3a6c5e20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('sync_fingerprint', sa.String(length=64), nullable=True))
+    op.create_table(
+        'sync_state',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('watermark', sa.String(length=100), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('sync_state')
+    op.drop_column('users', 'sync_fingerprint')
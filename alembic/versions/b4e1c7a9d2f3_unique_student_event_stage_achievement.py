@@ -0,0 +1,42 @@
+"""unique student/event/stage achievement
+
+Revision ID: b4e1c7a9d2f3
+Revises: fcf114dd8846
+Create Date: 2026-10-18 10:12:41.503214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e1c7a9d2f3'
+down_revision: Union[str, Sequence[str], None] = 'fcf114dd8846'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Удаляем дубликаты, оставляя последнюю запись для каждой тройки
+    op.execute("""
+        DELETE FROM student_achievements a
+        USING student_achievements b
+        WHERE a.student_id = b.student_id
+          AND a.event_id = b.event_id
+          AND a.stage_id = b.stage_id
+          AND a.id < b.id
+    """)
+    op.create_index(
+        'ix_student_achievements_student_event_stage',
+        'student_achievements',
+        ['student_id', 'event_id', 'stage_id'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_student_achievements_student_event_stage', table_name='student_achievements')
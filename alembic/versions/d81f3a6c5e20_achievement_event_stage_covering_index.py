@@ -0,0 +1,34 @@
+"""achievement event/stage covering index
+
+Revision ID: d81f3a6c5e20
+Revises: b4e1c7a9d2f3
+Create Date: 2026-10-18 11:03:17.284610
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81f3a6c5e20'
+down_revision: Union[str, Sequence[str], None] = 'b4e1c7a9d2f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_student_achievements_event_stage',
+        'student_achievements',
+        ['event_id', 'stage_id'],
+        unique=False,
+        postgresql_include=['student_id', 'result_id', 'achieved_at'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_student_achievements_event_stage', table_name='student_achievements')
@@ -14,6 +14,7 @@ from app.database.models.event_types import EventType
 from app.database.models.event_types import Stage
 from app.database.models.event_types import PossibleResult
 from app.database.models.achievements import Achievement
+from app.database.models.email import EmailLog
 
 
 
@@ -180,6 +181,20 @@ class StudentAchievementAdmin(ModelView, model=Achievement):
     }
 
 
+# Админка для журнала писем (только просмотр)
+class EmailLogAdmin(ModelView, model=EmailLog):
+    name = "Письмо"
+    name_plural = "Журнал писем"
+    icon = "fa-solid fa-envelope"
+
+    can_create = False
+    can_edit = False
+    column_list = [EmailLog.id, EmailLog.email, EmailLog.template_name, EmailLog.status, EmailLog.sent_at, EmailLog.error_message]
+    column_searchable_list = [EmailLog.email]
+    column_sortable_list = [EmailLog.id, EmailLog.status, EmailLog.sent_at]
+    column_default_sort = (EmailLog.sent_at, True)
+
+
 # Функция настройки админки
 def setup_admin(app):
     authentication_backend = AdminAuth(secret_key="your-secret-key-here")
@@ -200,6 +215,7 @@ def setup_admin(app):
     admin.add_view(StageAdmin)
     admin.add_view(StudentAchievementAdmin)
     admin.add_view(PossibleResultsAdmin)
+    admin.add_view(EmailLogAdmin)
 
 
     return admin
@@ -1,17 +1,30 @@
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from app.database.database import get_db
-from app.auth.utils import verify_token, get_user_by_email
+from app.auth.utils import verify_token
+from app.auth.principal_cache import Principal, principal_cache
 from app.database.models.users import User
 
 security = HTTPBearer()
 
 
-async def get_current_user(
+def _load_principal(db: Session, user_id: Optional[int], email: Optional[str]) -> Optional[Principal]:
+    """Загрузка пользователя вместе с ролями одним запросом"""
+    query = db.query(User).options(joinedload(User.roles))
+    if user_id is not None:
+        user = query.filter(User.id == user_id).first()
+    else:
+        user = query.filter(User.email == email).first()
+    return Principal.from_user(user) if user else None
+
+
+def get_current_principal(
         credentials: HTTPAuthorizationCredentials = Depends(security),
         db: Session = Depends(get_db)
-) -> User:
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -29,27 +42,64 @@ async def get_current_user(
         print("❌ No 'sub' field in token")
         raise credentials_exception
 
-    user = get_user_by_email(db, email=email)
+    user_id = token_data.get("user_id")
+    principal = principal_cache.get(user_id) if user_id is not None else None
+    if principal is not None:
+        return principal
 
-    if user is None:
+    principal = _load_principal(db, user_id, email)
+
+    if principal is None:
         print(f"❌ User with email {email} not found in database")
         raise credentials_exception
 
+    principal_cache.set(principal)
+    return principal
+
+
+def get_current_user(
+        principal: Principal = Depends(get_current_principal),
+        db: Session = Depends(get_db)
+) -> User:
+    """Полная ORM-модель пользователя (для эндпоинтов, которым нужны связи)"""
+    user = db.get(User, principal.id)
+    if user is None:
+        principal_cache.invalidate(principal.id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)):
+def get_current_active_principal(current_user: Principal = Depends(get_current_principal)) -> Principal:
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Пользователь неактивен")
+    return current_user
+
+
+def get_current_active_user(current_user: User = Depends(get_current_user)):
     print(current_user)
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Пользователь неактивен")
     return current_user
 
 
-async def get_current_active_teacher(current_user: User = Depends(get_current_user)):
+def get_current_active_teacher(current_user: Principal = Depends(get_current_principal)) -> Principal:
     if not current_user.is_active:
         raise HTTPException(status_code=403, detail="Пользователь неактивен")
 
-    if not any(role.name == 'teacher' for role in current_user.roles):
+    if not current_user.has_role('teacher'):
         raise HTTPException(status_code=403, detail="Доступно только для учителей")
     print('Был запретный запрос')
     return current_user
+
+
+def get_current_active_admin(current_user: Principal = Depends(get_current_principal)) -> Principal:
+    if not current_user.is_active:
+        raise HTTPException(status_code=403, detail="Пользователь неактивен")
+
+    if not current_user.has_role('admin'):
+        raise HTTPException(status_code=403, detail="Доступно только для администраторов")
+    return current_user
@@ -43,6 +43,10 @@ class LoginRequest(BaseModel):
 class VerifyEmailRequest(BaseModel):
     token: str
 
+class SetPasswordRequest(BaseModel):
+    token: str
+    password: str
+
 class UserResponse(BaseModel):
     email: str
     display_name: Optional[str] = None
@@ -0,0 +1,131 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+# Используем Argon2 вместо bcrypt (нет ограничения 72 байта)
+pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+
+
+class PasswordHashingBusy(Exception):
+    """Очередь хеширования паролей переполнена"""
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return pwd_context.verify(plain_password, hashed_password)
+    except Exception:
+        return False
+
+
+class PasswordHasherPool:
+    """
+    Argon2 в отдельных процессах, чтобы не занимать CPU воркера API
+    - пул процессов создается при первом обращении и пересоздается в дочернем процессе после fork
+    - одновременно принимается не больше workers + max_pending задач:
+      async API сразу отвечает PasswordHashingBusy, синхронный ждет до timeout
+    - workers=0 - хеширование в текущем потоке
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: процессы не наследуют потоки и блокировки приложения
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    def _submit(self, fn, *args) -> Future:
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            self._discard_executor()
+            future = self._get_executor().submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _discard_executor(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn, *args):
+        """Синхронный вызов (из потоков пула FastAPI и фоновых задач)"""
+        if self.workers <= 0:
+            return fn(*args)
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHashingBusy("Сервер перегружен, попробуйте позже")
+        try:
+            future = self._submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            return self._run_inline(fn, *args)
+
+    async def run_async(self, fn, *args):
+        """Вызов из async-обработчиков без блокировки цикла событий"""
+        if self.workers <= 0:
+            return await asyncio.to_thread(fn, *args)
+
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy("Сервер перегружен, попробуйте позже")
+        try:
+            future = self._submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            return await asyncio.to_thread(self._run_inline, fn, *args)
+
+    def _run_inline(self, fn, *args):
+        """Процесс пула упал - пересоздаем пул при следующем вызове, текущую задачу выполняем здесь"""
+        print("⚠️  Пул хеширования паролей недоступен, хеширование в текущем процессе")
+        self._discard_executor()
+        return fn(*args)
+
+    def reset(self):
+        """Сброс в дочернем процессе: пул процессов родителя не используется"""
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        self._lock = threading.Lock()
+
+
+password_hasher_pool = PasswordHasherPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    timeout=settings.PASSWORD_HASH_TIMEOUT,
+)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=password_hasher_pool.reset)
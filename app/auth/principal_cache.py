@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.database.models.users import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Данные аутентифицированного пользователя, достаточные для авторизации"""
+    id: int
+    email: str
+    display_name: Optional[str]
+    is_active: bool
+    roles: Tuple[str, ...]
+    group_name: Optional[str]
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            display_name=user.display_name,
+            is_active=bool(user.is_active),
+            roles=tuple(role.name for role in user.roles),
+            group_name=user.group_name,
+        )
+
+    def has_role(self, role_name: str) -> bool:
+        return role_name in self.roles
+
+
+class PrincipalCache:
+    """Потокобезопасный TTL/LRU кэш Principal по user_id"""
+
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._items: "OrderedDict[int, Tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None:
+                return None
+            expires_at, principal = item
+            if expires_at < time.monotonic():
+                del self._items[user_id]
+                return None
+            self._items.move_to_end(user_id)
+            return principal
+
+    def set(self, principal: Principal):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._items[principal.id] = (time.monotonic() + self.ttl_seconds, principal)
+            self._items.move_to_end(principal.id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, *user_ids: int):
+        with self._lock:
+            for user_id in user_ids:
+                self._items.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+)
+
+
+# Любое изменение пользователя через ORM (админка, синхронизация, регистрация)
+# сбрасывает его запись в кэше
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, target: User):
+    principal_cache.invalidate(target.id)
@@ -1,25 +1,27 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.database.models import User
-
-# Используем Argon2 вместо bcrypt (нет ограничения 72 байта)
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+from app.auth.password_hasher import pwd_context, password_hasher_pool, hash_password, check_password
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Проверка пароля"""
-    try:
-        return pwd_context.verify(plain_password, hashed_password)
-    except Exception:
-        return False
+    """Проверка пароля (в пуле процессов хеширования)"""
+    return password_hasher_pool.run(check_password, plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    """Хеширование пароля"""
-    return pwd_context.hash(password)
+    """Хеширование пароля (в пуле процессов хеширования)"""
+    return password_hasher_pool.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Проверка пароля для async-обработчиков"""
+    return await password_hasher_pool.run_async(check_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Хеширование пароля для async-обработчиков"""
+    return await password_hasher_pool.run_async(hash_password, password)
 
 
 def create_access_token(*, data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -29,6 +29,28 @@ class Settings:
 
 
 
+    # Кэш аутентифицированных пользователей (principal) в get_current_user
+    PRINCIPAL_CACHE_TTL_SECONDS: int = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+    PRINCIPAL_CACHE_MAX_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", 10000))
+
+    # Общий бэкенд версии каталога мероприятий для нескольких воркеров (пусто - кэш в процессе)
+    CATALOG_CACHE_REDIS_URL: str = os.getenv("CATALOG_CACHE_REDIS_URL", "")
+    # Статистика классов: общая версия (Redis) сбрасывает кэш во всех воркерах, TTL - страховка без Redis
+    ROSTER_STATS_REDIS_URL: str = os.getenv("ROSTER_STATS_REDIS_URL", CATALOG_CACHE_REDIS_URL)
+    ROSTER_STATS_TTL_SECONDS: int = int(os.getenv("ROSTER_STATS_TTL_SECONDS", 300))
+
+    # Колонка таблицы students во внешней БД для инкрементальной синхронизации (пусто - только полная)
+    STUDENT_SYNC_WATERMARK_COLUMN: str = os.getenv("STUDENT_SYNC_WATERMARK_COLUMN", "")
+    # Размер пакета потокового чтения учеников из внешней БД
+    STUDENT_SYNC_FETCH_SIZE: int = int(os.getenv("STUDENT_SYNC_FETCH_SIZE", 1000))
+    # Список сотрудников портала школы: общий кэш с условными запросами
+    TEACHER_ROSTER_URL: str = os.getenv("TEACHER_ROSTER_URL", "https://school1298.ru/portal/workers/workersPS-no.json")
+    TEACHER_ROSTER_TTL_SECONDS: int = int(os.getenv("TEACHER_ROSTER_TTL_SECONDS", 300))
+    TEACHER_ROSTER_STALE_SECONDS: int = int(os.getenv("TEACHER_ROSTER_STALE_SECONDS", 3600))  # отдавать устаревший, обновляя в фоне
+    # Плановая синхронизация внутри процесса (0 - выключено) и ее состав
+    SYNC_SCHEDULE_INTERVAL_MINUTES: int = int(os.getenv("SYNC_SCHEDULE_INTERVAL_MINUTES", 0))
+    SYNC_SCHEDULE_KINDS: str = os.getenv("SYNC_SCHEDULE_KINDS", "all")
+
     REFRESH_TOKEN_EXPIRE_DAYS: int = 30
     REFRESH_TOKEN_SECRET_KEY: str = "your-refresh-token-secret-key"
 
@@ -40,6 +62,27 @@ class Settings:
     DB_USER: str = os.getenv("DB_USER")  # Например: "remote_user"
     DB_PASSWORD : str = os.getenv("DB_PASSWORD")  # Например: "secure_password123"
 
+    # Пул соединений PostgreSQL
+    DB_POOL_MODE: str = os.getenv("DB_POOL_MODE", "queue")  # queue - пул соединений, null - без пула
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))  # секунд ожидания свободного соединения
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))  # пересоздавать соединения (сек)
+
+    # MySQL база школы (ученики) и пул соединений к ней; адрес и учетные данные - только из окружения
+    SCHOOL_DB_HOST: str = os.getenv("SCHOOL_DB_HOST")
+    SCHOOL_DB_PORT: int = int(os.getenv("SCHOOL_DB_PORT", 3306))
+    SCHOOL_DB_NAME: str = os.getenv("SCHOOL_DB_NAME", "students")
+    SCHOOL_DB_USER: str = os.getenv("SCHOOL_DB_USER")
+    SCHOOL_DB_PASSWORD: str = os.getenv("SCHOOL_DB_PASSWORD")
+    SCHOOL_DB_POOL_SIZE: int = int(os.getenv("SCHOOL_DB_POOL_SIZE", 5))
+    SCHOOL_DB_POOL_TIMEOUT: int = int(os.getenv("SCHOOL_DB_POOL_TIMEOUT", 10))  # секунд ожидания свободного соединения
+
+    # Пул процессов Argon2 (0 - хешировать в потоке запроса)
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))  # задач в очереди сверх воркеров
+    PASSWORD_HASH_TIMEOUT: int = int(os.getenv("PASSWORD_HASH_TIMEOUT", 10))  # секунд ожидания места в очереди
+
     # SMTP Settings
     SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
     SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
@@ -48,6 +91,30 @@ class Settings:
     SMTP_FROM_EMAIL = os.getenv("SMTP_FROM_EMAIL", "noreply@school1298.ru")
     SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "True").lower() == "true"
 
+    # Очередь исходящих писем
+    MAIL_QUEUE_MAX_SIZE: int = int(os.getenv("MAIL_QUEUE_MAX_SIZE", 20000))
+    MAIL_QUEUE_BATCH_SIZE: int = int(os.getenv("MAIL_QUEUE_BATCH_SIZE", 50))
+    MAIL_MAX_PER_CONNECTION: int = int(os.getenv("MAIL_MAX_PER_CONNECTION", 100))  # писем до переоткрытия SMTP-соединения
+    MAIL_CONNECTION_IDLE_SECONDS: int = int(os.getenv("MAIL_CONNECTION_IDLE_SECONDS", 60))
+    MAIL_MAX_ATTEMPTS: int = int(os.getenv("MAIL_MAX_ATTEMPTS", 5))
+    MAIL_RETRY_BACKOFF_SECONDS: int = int(os.getenv("MAIL_RETRY_BACKOFF_SECONDS", 30))  # удваивается с каждой попыткой
+
+    # Журнал писем: пакетная запись
+    EMAIL_LOG_BATCH_SIZE: int = int(os.getenv("EMAIL_LOG_BATCH_SIZE", 200))
+    EMAIL_LOG_FLUSH_SECONDS: int = int(os.getenv("EMAIL_LOG_FLUSH_SECONDS", 5))
+
+    # Массовые приглашения: токены выдаются пакетами, письма ставятся в очередь с ограничением скорости
+    INVITE_BATCH_SIZE: int = int(os.getenv("INVITE_BATCH_SIZE", 200))
+    INVITE_RATE_PER_MINUTE: int = int(os.getenv("INVITE_RATE_PER_MINUTE", 120))
+
     GOOGLE_CLIENT_ID=os.getenv("GOOGLE_CLIENT_ID", "")
+    # Адреса Google (переопределяются для проверки на локальном стабе)
+    GOOGLE_CERTS_URL: str = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+    GOOGLE_TOKENINFO_URL: str = os.getenv("GOOGLE_TOKENINFO_URL", "https://www.googleapis.com/oauth2/v1/tokeninfo")
+    GOOGLE_USERINFO_URL: str = os.getenv("GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v3/userinfo")
+    GOOGLE_HTTP_TIMEOUT_SECONDS: int = int(os.getenv("GOOGLE_HTTP_TIMEOUT_SECONDS", 10))
+    # Кэш проверенных токенов (не дольше срока действия самого токена), 0 - выключен
+    GOOGLE_TOKEN_CACHE_TTL_SECONDS: int = int(os.getenv("GOOGLE_TOKEN_CACHE_TTL_SECONDS", 300))
+    GOOGLE_TOKEN_CACHE_MAX_SIZE: int = int(os.getenv("GOOGLE_TOKEN_CACHE_MAX_SIZE", 10000))
 
 settings = Settings()
\ No newline at end of file
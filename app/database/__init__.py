@@ -1,3 +1,3 @@
-from .database import Base, engine, SessionLocal, get_db
+from .database import Base, engine, SessionLocal, get_db, get_pool_status, async_engine, AsyncSessionLocal, get_async_db
 
-__all__ = ["Base", "engine", "SessionLocal", "get_db"]
\ No newline at end of file
+__all__ = ["Base", "engine", "SessionLocal", "get_db", "get_pool_status", "async_engine", "AsyncSessionLocal", "get_async_db"]
\ No newline at end of file
@@ -1,7 +1,10 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
-from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import NullPool, QueuePool
 from dotenv import load_dotenv
 from app.core.config import settings
 
@@ -14,15 +17,150 @@ class Base(DeclarativeBase):
 
 # URL для подключения
 DATABASE_URL = f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+
+
+class PoolMetrics:
+    """Счетчики пула соединений для мониторинга (checkout, ожидание, ошибки)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidated = 0
+            self.timeouts = 0
+            self.waits = 0
+            self.wait_time_total = 0.0
+            self.wait_time_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.waits += 1
+            self.wait_time_total += seconds
+            self.wait_time_max = max(self.wait_time_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def increment(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidated": self.invalidated,
+                "timeouts": self.timeouts,
+                "wait_time_total": round(self.wait_time_total, 4),
+                "wait_time_max": round(self.wait_time_max, 4),
+                "wait_time_avg": round(self.wait_time_total / self.waits, 4) if self.waits else 0.0,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, измеряющий время ожидания свободного соединения"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            pool_metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+
+def _pool_options() -> dict:
+    """Параметры пула соединений из настроек"""
+    if settings.DB_POOL_MODE == "null":
+        # Без пула: новое соединение на каждый запрос
+        return {"poolclass": NullPool, "pool_pre_ping": True}
+
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,  # Проверять соединение перед использованием
+        "pool_use_lifo": True,  # Лишние соединения простаивают и закрываются по recycle
+    }
+
+
+def _create_engine():
+    """Создание движка в соответствии с настройками пула"""
+    options = _pool_options()
+    if settings.DB_POOL_MODE != "null":
+        options["poolclass"] = InstrumentedQueuePool
 
-# Создаем синхронный движок с оптимизациями
-engine = create_engine(
-    DATABASE_URL,
     # echo=settings.DEBUG,  # Логировать SQL только в debug режиме
-    poolclass=NullPool,  # Для избежания проблем с connection pool
-    pool_pre_ping=True,  # Проверять соединение перед использованием
-    pool_recycle=3600,  # Пересоздавать соединения каждый час
-)
+    return create_engine(DATABASE_URL, **options)
+
+
+# Создаем синхронный движок с пулом соединений
+engine = _create_engine()
+
+# Асинхронный движок (asyncpg) для горячих read-эндпоинтов
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_pool_options())
+
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_metrics.increment("connects")
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_metrics.increment("checkouts")
+
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    pool_metrics.increment("checkins")
+
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_metrics.increment("invalidated")
+
+
+def _reset_pool_after_fork():
+    """
+    После fork (gunicorn/uvicorn --workers) дочерний процесс не должен
+    использовать сокеты родителя: создаем новый пул, не закрывая чужие соединения
+    """
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    pool_metrics.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+
+def get_pool_status() -> dict:
+    """Текущее состояние пула и накопленные метрики"""
+    pool = engine.pool
+    status = {"mode": settings.DB_POOL_MODE, "metrics": pool_metrics.snapshot()}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    status["async_pool"] = async_engine.pool.status()
+    return status
 
 # Создаем синхронную фабрику сессий
 SessionLocal = sessionmaker(
@@ -49,6 +187,31 @@ def get_db():
     finally:
         db.close()
 
+# Асинхронная фабрика сессий
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False,
+)
+
+
+async def get_async_db():
+    """
+    Асинхронная зависимость для получения сессии БД
+    Использование:
+        @router.get("/")
+        async def endpoint(db: AsyncSession = Depends(get_async_db)):
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+
 def create_tables():
     """Создание всех таблиц (для инициализации)"""
     Base.metadata.create_all(bind=engine)
@@ -8,6 +8,7 @@ from .event_types import Stage
 from .event_types import PossibleResult
 from .achievements import Achievement
 from .email import EmailLog
+from .sync_state import SyncState
 from .associations import p_office_event_association, p_office_group_association
 
 __all__ = [
@@ -21,6 +22,7 @@ __all__ = [
     "PossibleResult",
     "Achievement",
     "EmailLog",
+    "SyncState",
     "p_office_event_association",
     "p_office_group_association"
 ]
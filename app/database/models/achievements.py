@@ -1,11 +1,25 @@
 from sqlalchemy.orm import relationship
 
 from ..database import Base
-from sqlalchemy import JSON, Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy import JSON, Column, Integer, String, ForeignKey, DateTime, func, Index
 
 
 class Achievement(Base):
     __tablename__ = "student_achievements"
+    __table_args__ = (
+        # Один результат ученика на стадию мероприятия (цель для ON CONFLICT)
+        Index(
+            "ix_student_achievements_student_event_stage",
+            "student_id", "event_id", "stage_id",
+            unique=True,
+        ),
+        # Журналы выбирают все результаты мероприятия по стадиям
+        Index(
+            "ix_student_achievements_event_stage",
+            "event_id", "stage_id",
+            postgresql_include=["student_id", "result_id", "achieved_at"],
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     teacher_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Index
 from sqlalchemy.sql import func
 from app.database.database import Base
 
@@ -14,5 +14,11 @@ class EmailLog(Base):
     error_message = Column(Text, nullable=True)
     sent_at = Column(DateTime, server_default=func.now())
 
+    __table_args__ = (
+        # Выборки админки: по статусу и по адресу, свежие сверху
+        Index('ix_email_logs_status_sent_at', 'status', 'sent_at'),
+        Index('ix_email_logs_email_sent_at', 'email', 'sent_at'),
+    )
+
     def __repr__(self):
         return f"<EmailLog {self.email} - {self.status}>"
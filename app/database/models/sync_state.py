@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, DateTime
+from app.database.database import Base
+
+
+class SyncState(Base):
+    """Состояние инкрементальной синхронизации (водяной знак источника)"""
+    __tablename__ = "sync_state"
+
+    name = Column(String(50), primary_key=True)  # student, teacher
+    watermark = Column(String(100), nullable=True)  # максимальное значение колонки изменений в источнике
+    updated_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<SyncState {self.name} - {self.watermark}>"
@@ -48,6 +48,7 @@ class User(Base):
     about = Column(Text, nullable=True)
     max_link_url = Column(String(255), nullable=True)
     archived = Column(Boolean, nullable=False, default=False)
+    sync_fingerprint = Column(String(64), nullable=True)  # sha256 полей из внешней системы на момент синхронизации
 
 
     # поля ученика
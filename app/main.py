@@ -6,6 +6,12 @@ from app.admin import setup_admin
 from app.database.database import engine, get_db
 from app.database import Base
 from app.routes import admin_router, api_router
+from app.services.sync_service import sync_scheduler
+from app.services.resend_email_service import email_service
+from app.services.email_log_writer import email_log_writer
+from app.services.google_auth_service import close_http_client
+from app.services.SchoolServices.school_db import school_db_pool
+from app.core.config import settings
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI(
@@ -31,6 +37,36 @@ app.add_middleware(
 admin = setup_admin(app)
 app.include_router(api_router, prefix="/api")
 
+
+@app.on_event("startup")
+def start_sync_scheduler():
+    # Без адреса и учетных данных БД школы синхронизация учеников невозможна
+    missing = school_db_pool.missing_settings()
+    if missing:
+        if settings.SYNC_SCHEDULE_INTERVAL_MINUTES > 0:
+            raise RuntimeError(f"Не заданы настройки БД школы: {', '.join(missing)}")
+        print(f"⚠️  Не заданы настройки БД школы: {', '.join(missing)} - синхронизация учеников недоступна")
+
+    # Плановая синхронизация учителей и учеников (если включена в настройках)
+    sync_scheduler.start()
+
+
+@app.on_event("shutdown")
+def stop_sync_scheduler():
+    sync_scheduler.stop()
+
+
+@app.on_event("shutdown")
+def drain_mail_queue():
+    # Даем очереди писем отправить накопленное и дописываем журнал
+    email_service.queue.stop()
+    email_log_writer.stop()
+
+
+@app.on_event("shutdown")
+async def close_google_http_client():
+    await close_http_client()
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 
+from app.database import get_pool_status
+
 from .admin import router as admin_router
 from .auth import router as auth_router
 from .user import router as user_router
@@ -30,3 +32,9 @@ api_router.include_router(project_office_router, prefix="/project-office", tags=
 def api_health_check():
 
     return {"status": "healthy", "message": "API is running"}
+
+
+@api_router.get("/health/db", tags=["health"])
+def api_db_health_check():
+    """Состояние пула соединений с БД"""
+    return {"status": "healthy", "pool": get_pool_status()}
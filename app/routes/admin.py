@@ -1,33 +1,214 @@
-from fastapi import APIRouter
+import asyncio
+import json
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from fastapi import Depends
 
-from app.auth.dependencies import get_current_active_teacher
+from app.auth.dependencies import get_current_active_teacher, get_current_active_admin
+from app.auth.principal_cache import Principal
 from app.database import get_db
-from app.database.models import EventType, Stage
-from app.services.sync_service import TeacherSyncService
-from app.services.sync_service import StudentSyncService
+from app.database.models import EventType, Stage, Group, EmailLog
+from app.services.sync_service import TeacherSyncService, StudentSyncService
+from app.services.sync_service import sync_job_manager, SyncJobConflict
+from app.services.sync_service.sync_jobs import SyncJob
+from app.services.roster_stats_service import roster_stats_service
+from app.services.resend_email_service import email_service
+from app.services.invite_campaign import invite_campaign_manager, InviteCampaign, InviteCampaignConflict
 from sqlalchemy.orm import joinedload
 router = APIRouter()
 
 
 
-@router.get("/sync_teachers")
-def sync_teachers(db: Session = Depends(get_db)):
-    teacher_service = TeacherSyncService()
-    teacher_result = teacher_service.sync_teachers(db)
+def _start_sync_job(kind: str, incremental: bool = False) -> SyncJob:
+    try:
+        return sync_job_manager.start(kind, incremental=incremental)
+    except SyncJobConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+def _get_sync_job(job_id: str) -> SyncJob:
+    job = sync_job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача синхронизации не найдена")
+    return job
+
+
+@router.post("/sync_teachers")
+def sync_teachers(current_user: Principal = Depends(get_current_active_admin)):
+    job = _start_sync_job("teachers")
+    return {"message": "Синхронизация учителей запущена", "job_id": job.id}
+
+
+
+@router.post("/sync_students")
+def sync_students(incremental: bool = False, current_user: Principal = Depends(get_current_active_admin)):
+    job = _start_sync_job("students", incremental=incremental)
+    return {"message": "Синхронизация учеников запущена", "job_id": job.id}
+
+
+@router.post("/sync_all")
+def sync_all(incremental: bool = False, current_user: Principal = Depends(get_current_active_admin)):
+    """Учителя и ученики одной задачей: загрузка из обоих источников идет параллельно"""
+    job = _start_sync_job("all", incremental=incremental)
+    return {"message": "Полная синхронизация запущена", "job_id": job.id}
+
+
+@router.get("/sync_plan/{kind}")
+def get_sync_plan(
+        kind: Literal["teachers", "students"],
+        format: Literal["json", "ndjson"] = "json",
+        db: Session = Depends(get_db),
+        current_user: Principal = Depends(get_current_active_admin)
+):
+    """Dry-run: что изменит синхронизация, без записи; ndjson - построчная выгрузка для аудита"""
+    if kind == "teachers":
+        plan = TeacherSyncService().plan_teachers(db)
+    else:
+        plan = StudentSyncService().plan_students(db)
+
+    if format == "ndjson":
+        return StreamingResponse(
+            plan.iter_ndjson(),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f"attachment; filename=sync_plan_{kind}.ndjson"}
+        )
+
+    return {"summary": plan.summary(), **plan.model_dump()}
+
+
+@router.get("/sync_jobs")
+def get_sync_jobs(current_user: Principal = Depends(get_current_active_admin)):
+    return [job.to_dict() for job in sync_job_manager.list()]
+
+
+@router.get("/sync_jobs/{job_id}")
+def get_sync_job(job_id: str, current_user: Principal = Depends(get_current_active_admin)):
+    return _get_sync_job(job_id).to_dict()
+
+
+@router.get("/sync_jobs/{job_id}/stream")
+async def stream_sync_job(job_id: str, current_user: Principal = Depends(get_current_active_admin)):
+    """Прогресс задачи в формате Server-Sent Events до ее завершения"""
+    job = _get_sync_job(job_id)
+
+    async def events():
+        while True:
+            finished = job.done.is_set()
+            yield f"data: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+            if finished:
+                break
+            await asyncio.sleep(1)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.post("/sync_jobs/{job_id}/cancel")
+def cancel_sync_job(job_id: str, current_user: Principal = Depends(get_current_active_admin)):
+    _get_sync_job(job_id)
+    return sync_job_manager.cancel(job_id).to_dict()
+
+
+@router.get("/mail_queue")
+def get_mail_queue_stats(current_user: Principal = Depends(get_current_active_admin)):
+    """Состояние очереди исходящих писем"""
+    return email_service.queue.stats()
+
+
+@router.get("/email_logs")
+def get_email_logs(
+        status: Optional[str] = None,
+        email: Optional[str] = None,
+        limit: int = Query(100, le=1000),
+        db: Session = Depends(get_db),
+        current_user: Principal = Depends(get_current_active_admin)
+):
+    """Последние записи журнала писем по статусу и/или адресу"""
+    query = db.query(EmailLog)
+    if status:
+        query = query.filter(EmailLog.status == status)
+    if email:
+        query = query.filter(EmailLog.email == email)
+
+    return [
+        {
+            "id": log.id,
+            "email": log.email,
+            "subject": log.subject,
+            "template_name": log.template_name,
+            "status": log.status,
+            "error_message": log.error_message,
+            "sent_at": log.sent_at,
+        }
+        for log in query.order_by(EmailLog.sent_at.desc()).limit(limit)
+    ]
+
+
+def _get_invite_campaign(campaign_id: str) -> InviteCampaign:
+    campaign = invite_campaign_manager.get(campaign_id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Рассылка не найдена")
+    return campaign
+
+
+@router.post("/invite_campaigns")
+def start_invite_campaign(
+        role: Optional[str] = None,
+        groups: Optional[List[str]] = Query(None),
+        include_recent: bool = False,
+        current_user: Principal = Depends(get_current_active_admin)
+):
+    """Массовая рассылка писем подтверждения пользователям без пароля (роль и/или классы)"""
+    try:
+        campaign = invite_campaign_manager.start(role=role, groups=groups, include_recent=include_recent)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InviteCampaignConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return campaign.to_dict()
+
+
+@router.get("/invite_campaigns")
+def get_invite_campaigns(current_user: Principal = Depends(get_current_active_admin)):
+    return [campaign.to_dict() for campaign in invite_campaign_manager.list()]
+
+
+@router.get("/invite_campaigns/{campaign_id}")
+def get_invite_campaign(campaign_id: str, current_user: Principal = Depends(get_current_active_admin)):
+    return _get_invite_campaign(campaign_id).to_dict()
+
+
+@router.post("/invite_campaigns/{campaign_id}/pause")
+def pause_invite_campaign(campaign_id: str, current_user: Principal = Depends(get_current_active_admin)):
+    _get_invite_campaign(campaign_id)
+    return invite_campaign_manager.pause(campaign_id).to_dict()
 
-    return {"message": f"{teacher_result}"}
 
+@router.post("/invite_campaigns/{campaign_id}/resume")
+def resume_invite_campaign(campaign_id: str, current_user: Principal = Depends(get_current_active_admin)):
+    _get_invite_campaign(campaign_id)
+    try:
+        return invite_campaign_manager.resume(campaign_id).to_dict()
+    except InviteCampaignConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 
-@router.get("/sync_students")
-def sync_teachers(db: Session = Depends(get_db)):
+@router.post("/invite_campaigns/{campaign_id}/cancel")
+def cancel_invite_campaign(campaign_id: str, current_user: Principal = Depends(get_current_active_admin)):
+    _get_invite_campaign(campaign_id)
+    return invite_campaign_manager.cancel(campaign_id).to_dict()
 
-    sync_service = StudentSyncService()
-    student_result = sync_service.sync_students(db)
 
-    return {"message": f"{student_result}"}
+@router.get("/groups_stats")
+def get_groups_stats(db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_admin)):
+    groups = db.query(Group).order_by(Group.name).all()
+    stats = roster_stats_service.get_stats(db, [group.name for group in groups])
+    return [
+        {"id": group.id, **stats[group.name].model_dump()}
+        for group in groups
+    ]
 
 
 @router.get("/all_event_types")
@@ -3,7 +3,7 @@ import secrets
 import string
 from pydantic import BaseModel, EmailStr
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from app.database.database import get_db
@@ -12,9 +12,11 @@ from app.services.registration_service import RegistrationService
 from app.database.models import User
 from app.services.resend_email_service import email_service
 from app.auth.utils import create_access_token, create_refresh_token, verify_token, get_password_hash
+from app.auth.password_hasher import PasswordHashingBusy
 from app.core.config import settings
-from app.auth.dependencies import get_current_active_user, get_current_user
-from app.auth.models import RegisterRequest, VerifyEmailRequest, LoginRequest, UserResponse, RefreshTokenRequest, \
+from app.auth.dependencies import get_current_active_principal
+from app.auth.principal_cache import Principal
+from app.auth.models import RegisterRequest, VerifyEmailRequest, SetPasswordRequest, LoginRequest, UserResponse, RefreshTokenRequest, \
     ForgotPasswordRequest, GoogleAuthRequest
 from app.services.user_service import UserService
 
@@ -43,6 +45,36 @@ def register(
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except PasswordHashingBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def _verified_login_response(user: User, message: str) -> dict:
+    """Токены для автоматического входа после подтверждения email"""
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.email, "user_id": user.id},
+        expires_delta=access_token_expires
+    )
+    refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    refresh_token = create_refresh_token(
+        data={"sub": user.email, "user_id": user.id, "type": "refresh"},
+        expires_delta=refresh_token_expires
+    )
+    return {
+        "message": message,
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "user": {
+            "id": user.id,
+            "external_id": user.external_id,
+            "email": user.email,
+            "display_name": user.display_name,
+            "is_verified": user.is_verified,
+            "roles": [i.name for i in user.roles],
+        }
+    }
 
 
 @router.post("/verify-email", response_model=dict)
@@ -53,34 +85,26 @@ def verify_email(
     """Подтверждение email адреса"""
     try:
         user = RegistrationService.verify_email(db, verify_data.token)
+        return _verified_login_response(user, "Email успешно верифицирован!")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Создаем токен для автоматического входа
-        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user.email, "user_id": user.id},
-            expires_delta=access_token_expires
-        )
-        refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-        refresh_token = create_refresh_token(
-            data={"sub": user.email, "user_id": user.id, "type": "refresh"},
-            expires_delta=refresh_token_expires
-        )
-        return {
-            "message": "Email успешно верифицирован!",
-            "access_token": access_token,
-            "refresh_token": refresh_token,
-            "token_type": "bearer",
-            "user": {
-                "id": user.id,
-                "external_id": user.external_id,
-                "email": user.email,
-                "display_name": user.display_name,
-                "is_verified": user.is_verified,
-                "roles": [i.name for i in user.roles],
-            }
-        }
+
+@router.post("/set-password", response_model=dict)
+def set_password(
+        set_password_data: SetPasswordRequest,
+        db: Session = Depends(get_db)
+):
+    """Установка пароля по ссылке из приглашения (массовая рассылка)"""
+    try:
+        user = RegistrationService.get_invited_user(db, set_password_data.token)
+        password_hash = get_password_hash(set_password_data.password)
+        user = RegistrationService.complete_invite(db, user, password_hash)
+        return _verified_login_response(user, "Пароль установлен, email подтвержден!")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except PasswordHashingBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 
 # @router.post("/resend-verification", response_model=dict)
@@ -113,7 +137,10 @@ def login(
 ):
     """Вход в систему"""
 
-    user = UserService.authenticate_user(db, login_data.email, login_data.password)
+    try:
+        user = UserService.authenticate_user(db, login_data.email, login_data.password)
+    except PasswordHashingBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     if not user:
         raise HTTPException(status_code=401, detail="Неверные логин или пароль!")
     # Проверяем пройдена ли регистрация пользователем
@@ -165,14 +192,14 @@ def login(
 
 @router.get("/me", response_model=UserResponse)
 def get_current_user(
-        current_user: User = Depends(get_current_active_user)
+        current_user: Principal = Depends(get_current_active_principal)
 ):
     print(current_user.roles)
     """Получить информацию о текущем пользователе"""
     res = {
         "email": current_user.email,
         "display_name": current_user.display_name,
-        "roles": [i.name for i in current_user.roles],
+        "roles": list(current_user.roles),
     }
     return res
 
@@ -242,9 +269,8 @@ def generate_random_password(length: int = 12) -> str:
 
 
 @router.post("/forgot-password", response_model=dict)
-async def forgot_password(
+def forgot_password(
         forgot_data: ForgotPasswordRequest,
-        background_tasks: BackgroundTasks,
         db: Session = Depends(get_db)
 ):
     """Восстановление пароля - отправка нового пароля на email"""
@@ -271,10 +297,8 @@ async def forgot_password(
         user.updated_at = datetime.datetime.utcnow()
         db.commit()
 
-        # Отправляем email с новым паролем в фоновом режиме
-        background_tasks.add_task(
-            email_service.send_password_reset_email,
-            db,
+        # Письмо с новым паролем уходит через очередь отправки
+        email_service.send_password_reset_email(
             user.email,
             new_password,
             user.display_name
@@ -284,6 +308,8 @@ async def forgot_password(
             "message": "Если пользователь с таким email существует, на него будет отправлен новый пароль"
         }
 
+    except PasswordHashingBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
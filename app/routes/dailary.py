@@ -1,14 +1,18 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, or_, func, literal_column, literal, select, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List
 
 from ..auth.dependencies import get_current_active_user, get_current_active_teacher
+from ..auth.principal_cache import Principal
 from ..database import get_db
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional
 from app.database.models import User, Event, EventType, Stage, Achievement, PossibleResult, Group
+from app.services.event_type_service.event_type_service import EventTypeService
 from datetime import datetime
 router = APIRouter()
 
@@ -43,18 +47,22 @@ def get_class_journal(
         event_id: int,
         group_id: str,  # group_name из User
         db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_active_teacher)
+        current_user: Principal = Depends(get_current_active_teacher)
 ):
     """
     Получить журнал класса по мероприятию
+    Фиксированное число запросов к БД независимо от размера класса
     """
-    # Проверяем существование мероприятия
-    event = db.query(Event).filter(Event.id == event_id).first()
+    # Проверяем существование мероприятия (вместе с типом мероприятия)
+    event = db.query(Event).options(joinedload(Event.event_type)).filter(Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Мероприятие не найдено")
 
-    # Получаем всех учеников указанного класса
     group = db.query(Group).filter(Group.id == group_id).first()
+    if not group:
+        raise HTTPException(status_code=404, detail="Класс не найден")
+
+    # Получаем всех учеников указанного класса
     students = db.query(User).filter(
         User.group_name == group.name,
         User.archived == False,
@@ -63,12 +71,41 @@ def get_class_journal(
     if not students:
         raise HTTPException(status_code=404, detail="В классе нет учеников")
 
-    # Получаем тип мероприятия и его стадии
-    event_type = db.query(EventType).filter(EventType.id == event.event_type_id).first()
-    stages = db.query(Stage).filter(
+    event_type = event.event_type
+
+    # Стадии вместе с возможными результатами - одним запросом
+    stages = db.query(Stage).options(
+        joinedload(Stage.possible_results)
+    ).filter(
         Stage.event_type_id == event.event_type_id
     ).order_by(Stage.stage_order).all()
 
+    # Все достижения класса по мероприятию вместе с результатами - одним запросом
+    achievements = db.query(Achievement).options(
+        joinedload(Achievement.result)
+    ).join(
+        User, Achievement.student_id == User.id
+    ).filter(
+        Achievement.event_id == event_id,
+        User.group_name == group.name,
+        User.archived == False,
+    ).all()
+    achievements_map = {
+        (achievement.student_id, achievement.stage_id): achievement
+        for achievement in achievements
+    }
+
+    stage_possible_results = {
+        stage.id: [
+            {
+                "id": pr.id,
+                "title": pr.title,
+                "points": pr.points_for_done
+            } for pr in stage.possible_results
+        ]
+        for stage in stages
+    }
+
     result = []
 
     for student in students:
@@ -89,19 +126,8 @@ def get_class_journal(
         completed_stages = 0
 
         for stage in stages:
-            # Получаем возможные результаты для стадии
-            possible_results = db.query(PossibleResult).filter(
-                PossibleResult.stage_id == stage.id
-            ).all()
-
             # Ищем достижение ученика для этой стадии
-            achievement = db.query(Achievement).filter(
-                and_(
-                    Achievement.student_id == student.id,
-                    Achievement.event_id == event_id,
-                    Achievement.stage_id == stage.id
-                )
-            ).first()
+            achievement = achievements_map.get((student.id, stage.id))
 
             current_score = 0
             result_title = None
@@ -112,16 +138,10 @@ def get_class_journal(
                 current_score = achievement.result.points_for_done
                 result_title = achievement.result.title
 
-                # НОВАЯ ЛОГИКА: проверяем удовлетворяет ли результат минимальным требованиям
+                # Проверяем удовлетворяет ли результат минимальным требованиям
                 if current_score >= stage.min_score_for_finished:
                     status = "зачет"
                     completed_stages += 1
-                else:
-                    status = "незачет"
-            else:
-                # Если достижения нет
-                status = "незачет"
-                current_score = 0
 
             total_score += current_score
 
@@ -134,13 +154,7 @@ def get_class_journal(
                 min_required_score=stage.min_score_for_finished,
                 current_score=current_score,
                 stage_id=stage.id,
-                possible_results=[
-                    {
-                        "id": pr.id,
-                        "title": pr.title,
-                        "points": pr.points_for_done
-                    } for pr in possible_results
-                ]
+                possible_results=stage_possible_results[stage.id]
             )
 
             student_data["stages"].append(stage_data)
@@ -160,84 +174,181 @@ def update_student_result(
         stage_id: int,
         request: UpdateResultRequest,
         db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_active_teacher),
+        current_user: Principal = Depends(get_current_active_teacher),
 
 ):
-    result_id = request.result_id
-    teacher_id = current_user.id
     """
     Обновить результат ученика для стадии мероприятия
+    Одна инструкция INSERT ... SELECT ... ON CONFLICT DO UPDATE
     """
-    # Проверяем существование сущностей
-    student = db.query(User).filter(User.id == student_id).first()
-    if not student:
+    # Данные ученика берем из users в том же запросе; существование мероприятия,
+    # стадии и результата гарантируют внешние ключи
+    student_source = select(
+        literal(current_user.id),
+        User.id,
+        literal(event_id),
+        literal(stage_id),
+        literal(request.result_id),
+        func.json_build_object(
+            "student_name", User.display_name,
+            "group_name", User.group_name
+        )
+    ).where(User.id == student_id)
+
+    stmt = pg_insert(Achievement).from_select(
+        ["teacher_id", "student_id", "event_id", "stage_id", "result_id", "student_data"],
+        student_source
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Achievement.student_id, Achievement.event_id, Achievement.stage_id],
+        set_={
+            "result_id": stmt.excluded.result_id,
+            "teacher_id": stmt.excluded.teacher_id,
+            "achieved_at": func.now(),
+        }
+    ).returning(Achievement.id)
+
+    try:
+        achievement_id = db.execute(stmt).scalar()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Мероприятие, стадия или результат не найдены")
+
+    if achievement_id is None:
         raise HTTPException(status_code=404, detail="Ученик не найден")
 
-    event = db.query(Event).filter(Event.id == event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Мероприятие не найдено")
+    db.commit()
 
-    stage = db.query(Stage).filter(Stage.id == stage_id).first()
-    if not stage:
-        raise HTTPException(status_code=404, detail="Стадия не найдена")
+    return {"message": "Результат успешно обновлен"}
 
-    result = db.query(PossibleResult).filter(PossibleResult.id == result_id).first()
-    if not result:
-        raise HTTPException(status_code=404, detail="Результат не найден")
 
-    teacher = db.query(User).filter(User.id == teacher_id).first()
-    if not teacher:
-        raise HTTPException(status_code=404, detail="Учитель не найден")
+class BulkResultCell(BaseModel):
+    student_id: int
+    stage_id: int
+    result_id: int
 
-    # Ищем существующее достижение
-    existing_achievement = db.query(Achievement).filter(
-        and_(
-            Achievement.student_id == student_id,
-            Achievement.event_id == event_id,
-            Achievement.stage_id == stage_id
+
+class BulkUpdateResultsRequest(BaseModel):
+    cells: List[BulkResultCell]
+
+
+class BulkCellStatus(BaseModel):
+    student_id: int
+    stage_id: int
+    result_id: int
+    status: str  # created, updated, error
+    detail: Optional[str] = None
+
+
+class BulkUpdateResultsResponse(BaseModel):
+    message: str
+    results: List[BulkCellStatus]
+
+
+@router.post("/{event_id}/bulk", response_model=BulkUpdateResultsResponse)
+def bulk_update_student_results(
+        event_id: int,
+        request: BulkUpdateResultsRequest,
+        db: Session = Depends(get_db),
+        current_user: Principal = Depends(get_current_active_teacher),
+):
+    """
+    Массовое выставление результатов (столбец/таблица журнала) одним запросом
+    Проверки выполняются пакетно, запись - одним INSERT ... ON CONFLICT DO UPDATE
+    """
+    event = db.query(Event).filter(Event.id == event_id).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Мероприятие не найдено")
+
+    cells = request.cells
+    student_ids = {cell.student_id for cell in cells}
+    stage_ids = {cell.stage_id for cell in cells}
+    result_ids = {cell.result_id for cell in cells}
+
+    students = {
+        row.id: row
+        for row in db.query(User.id, User.display_name, User.group_name).filter(User.id.in_(student_ids))
+    }
+    event_stage_ids = {
+        stage_id for (stage_id,) in db.query(Stage.id).filter(
+            Stage.id.in_(stage_ids),
+            Stage.event_type_id == event.event_type_id
         )
-    ).first()
-
-    if existing_achievement:
-        # Обновляем существующее достижение
-        existing_achievement.result_id = result_id
-        existing_achievement.teacher_id = teacher_id
-        existing_achievement.achieved_at = func.now()
-    else:
-        # Создаем новое достижение
-        new_achievement = Achievement(
-            student_id=student_id,
-            teacher_id=teacher_id,
-            event_id=event_id,
-            stage_id=stage_id,
-            result_id=result_id,
-            student_data={
-                "student_name": student.display_name,
-                "group_name": student.group_name
+    }
+    result_stages = dict(
+        db.query(PossibleResult.id, PossibleResult.stage_id).filter(PossibleResult.id.in_(result_ids)).all()
+    )
+
+    statuses = [
+        BulkCellStatus(student_id=cell.student_id, stage_id=cell.stage_id, result_id=cell.result_id, status="error")
+        for cell in cells
+    ]
+    rows = {}
+    for index, cell in enumerate(cells):
+        if cell.student_id not in students:
+            statuses[index].detail = "Ученик не найден"
+        elif cell.stage_id not in event_stage_ids:
+            statuses[index].detail = "Стадия не найдена"
+        elif result_stages.get(cell.result_id) != cell.stage_id:
+            statuses[index].detail = "Результат не найден"
+        else:
+            key = (cell.student_id, cell.stage_id)
+            if key in rows:
+                # Повторная ячейка в запросе - побеждает последняя
+                previous_index = rows[key][0]
+                statuses[previous_index].detail = "Ячейка указана повторно"
+            student = students[cell.student_id]
+            rows[key] = (index, {
+                "student_id": cell.student_id,
+                "teacher_id": current_user.id,
+                "event_id": event_id,
+                "stage_id": cell.stage_id,
+                "result_id": cell.result_id,
+                "student_data": {
+                    "student_name": student.display_name,
+                    "group_name": student.group_name
+                }
+            })
+
+    if rows:
+        stmt = pg_insert(Achievement).values([row for _, row in rows.values()])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Achievement.student_id, Achievement.event_id, Achievement.stage_id],
+            set_={
+                "result_id": stmt.excluded.result_id,
+                "teacher_id": stmt.excluded.teacher_id,
+                "achieved_at": func.now(),
             }
+        ).returning(
+            Achievement.student_id,
+            Achievement.stage_id,
+            # xmax = 0 только у только что вставленных строк
+            literal_column("(xmax = 0)").label("inserted")
         )
-        db.add(new_achievement)
+        for written in db.execute(stmt):
+            index = rows[(written.student_id, written.stage_id)][0]
+            statuses[index].status = "created" if written.inserted else "updated"
 
-    db.commit()
+        db.commit()
 
-    return {"message": "Результат успешно обновлен"}
+    saved = sum(1 for status in statuses if status.status != "error")
+    return BulkUpdateResultsResponse(
+        message=f"Сохранено результатов: {saved} из {len(cells)}",
+        results=statuses
+    )
 
 
 @router.get("/events/{event_type_id}/stages")
-def get_event_stages(event_type_id: int, db: Session = Depends(get_db),current_user: User = Depends(get_current_active_teacher)):
+def get_event_stages(event_type_id: int, db: Session = Depends(get_db),current_user: Principal = Depends(get_current_active_teacher)):
     """
     Получить стадии типа мероприятия
     """
-    stages = db.query(Stage).filter(
-        Stage.event_type_id == event_type_id
-    ).order_by(Stage.stage_order).all()
+    event_type = EventTypeService(db).get_event_type_by_id(event_type_id)
+    if not event_type:
+        return []
 
     result = []
-    for stage in stages:
-        possible_results = db.query(PossibleResult).filter(
-            PossibleResult.stage_id == stage.id
-        ).all()
-
+    for stage in event_type.stages:
         result.append({
             "id": stage.id,
             "title": stage.title,
@@ -248,7 +359,7 @@ def get_event_stages(event_type_id: int, db: Session = Depends(get_db),current_u
                     "id": pr.id,
                     "title": pr.title,
                     "points_for_done": pr.points_for_done
-                } for pr in possible_results
+                } for pr in stage.possible_results
             ]
         })
 
@@ -261,25 +372,23 @@ def delete_student_result(
         student_id: int,
         stage_id: int,
         db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_active_teacher),
+        current_user: Principal = Depends(get_current_active_teacher),
 ):
     """
     Удалить результат ученика для стадии мероприятия
     """
-    # Находим достижение для удаления
-    achievement = db.query(Achievement).filter(
-        and_(
+    # Удаляем достижение одним запросом
+    deleted_id = db.execute(
+        delete(Achievement).where(
             Achievement.student_id == student_id,
             Achievement.event_id == event_id,
             Achievement.stage_id == stage_id
-        )
-    ).first()
+        ).returning(Achievement.id)
+    ).scalar()
 
-    if not achievement:
+    if deleted_id is None:
         raise HTTPException(status_code=404, detail="Результат не найден")
 
-    # Удаляем достижение
-    db.delete(achievement)
     db.commit()
 
     return {"message": "Результат успешно удален"}
\ No newline at end of file
@@ -8,16 +8,18 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.database.models import User
 from app.services.event_type_service.event_type_service import EventTypeService
+from app.auth.principal_cache import Principal
 from app.auth.dependencies import get_current_active_teacher
 from app.services.event_type_service.schemas import EventTypeResponse
 from app.database.models import Event
+from app.database.models import EventType as EventTypeModel
 router = APIRouter()
 class EventType(BaseModel):
     title: str
     description: str
 
 @router.get("/event_types", response_model=List[EventTypeResponse])
-def get_event_types(current_user: User=Depends(get_current_active_teacher), db: Session = Depends(get_db)):
+def get_event_types(current_user: Principal=Depends(get_current_active_teacher), db: Session = Depends(get_db)):
     service = EventTypeService(db)
     event_types = service.get_event_types_by_leader(current_user.id)
     return event_types
@@ -25,12 +27,7 @@ def get_event_types(current_user: User=Depends(get_current_active_teacher), db:
 
 
 @router.get("/events")
-def get_events(current_user: User=Depends(get_current_active_teacher), db: Session = Depends(get_db)):
-    service = EventTypeService(db)
-    event_types = service.get_all_event_types_with_details()
-    print(event_types)
-    events = []
-    for event_type in event_types:
-        for i in event_type.events:
-            events.append(i)
+def get_events(current_user: Principal=Depends(get_current_active_teacher), db: Session = Depends(get_db)):
+    # Мероприятия всех типов одним запросом (каталог в кэше хранит только краткие данные)
+    events = db.query(Event).join(Event.event_type).order_by(EventTypeModel.title).all()
     return events
\ No newline at end of file
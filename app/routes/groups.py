@@ -10,23 +10,35 @@ from app.database import get_db
 from app.database.models import User, Group
 from app.services.event_type_service.event_type_service import EventTypeService
 from app.auth.dependencies import get_current_active_user, get_current_active_teacher
+from app.auth.principal_cache import Principal
 from app.services.event_type_service.schemas import EventTypeResponse
+from app.services.roster_stats_service import roster_stats_service
 from app.database.models import Event
 router = APIRouter()
 @router.get('/all')
-def get_all_groups(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_teacher)):
+def get_all_groups(db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_teacher)):
     groups_list = db.query(Group).all()
     return groups_list
 
 
 @router.get('/for_group_leader')
-def get_all_groups(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_teacher)):
+def get_all_groups(db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_teacher)):
 
-    groups = current_user.groups_leader
+    groups = db.query(User.groups_leader).filter(User.id == current_user.id).scalar() or []
     all_groups_list = db.query(Group).all()
     teacher_classes = []
     for group in all_groups_list:
         if group.name in groups:
             teacher_classes.append(group)
     print(teacher_classes)
-    return teacher_classes
\ No newline at end of file
+    stats = roster_stats_service.get_stats(db, [group.name for group in teacher_classes])
+    return [
+        {
+            "id": group.id,
+            "name": group.name,
+            "student_count": stats[group.name].active_count,
+            "archived_count": stats[group.name].archived_count,
+            "class_teacher": stats[group.name].class_teacher,
+        }
+        for group in teacher_classes
+    ]
\ No newline at end of file
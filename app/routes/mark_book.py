@@ -1,8 +1,8 @@
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import date, datetime
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, func, select
 from app.database.models import *
 
 class StageMark(BaseModel):
@@ -30,8 +30,8 @@ class RecordBookResponse(BaseModel):
     marks: List[EventMark]
 
 
-def get_student_record_book_marks_optimized(
-        db: Session,
+async def get_student_record_book_marks_optimized(
+        db: AsyncSession,
         student_id: int,
         student_class: str
 ) -> RecordBookResponse:
@@ -40,7 +40,7 @@ def get_student_record_book_marks_optimized(
     """
 
     # ОДИН сложный запрос вместо множественных
-    query = db.query(
+    query = select(
         Event.id.label('event_id'),
         Event.title.label('event_title'),
         Event.date_start,
@@ -78,7 +78,7 @@ def get_student_record_book_marks_optimized(
     ) \
         .order_by(Event.id, Stage.stage_order)
 
-    rows = query.all()
+    rows = (await db.execute(query)).all()
 
     if not rows:
         return RecordBookResponse(marks=[])
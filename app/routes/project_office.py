@@ -1,15 +1,19 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_,func,case
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_,func,case,select,cast,Text
+from sqlalchemy.dialects.postgresql import aggregate_order_by, JSONB
 from fastapi import APIRouter, Depends, HTTPException,Query
 from typing import List
 
-from ..auth.dependencies import get_current_active_user
-from ..database import get_db
+from ..auth.dependencies import get_current_active_principal
+from ..auth.principal_cache import Principal
+from ..database import get_db, get_async_db
 from app.database.models import User, Event, ProjectOffice, EventType, Stage, Achievement, PossibleResult, Group, \
     p_office_group_association, p_office_event_association
+from app.services.roster_stats_service import roster_stats_service
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
 
 class StageResultResponse(BaseModel):
     name: str
@@ -43,10 +47,10 @@ router = APIRouter()
 
 
 @router.get("/journal/{event_id}", response_model=List[ProjectOfficeJournalResponse])
-def get_project_office_journal(
+async def get_project_office_journal(
         event_id: int,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_active_user)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(get_current_active_principal)
 ):
     """
     Получить журнал по мероприятию для проектного офиса (классы проектного офиса)
@@ -54,7 +58,7 @@ def get_project_office_journal(
     """
 
     # ОДИН сложный запрос для получения всех данных
-    query = db.query(
+    query = select(
         User.id.label('student_id'),
         User.display_name.label('student_name'),
         User.group_name,
@@ -112,17 +116,17 @@ def get_project_office_journal(
     ) \
         .order_by(Group.name, User.display_name, Stage.stage_order)
 
-    rows = query.all()
+    rows = (await db.execute(query)).all()
 
     if not rows:
         # Проверяем существование мероприятия и доступ
-        event_exists = db.query(Event).filter(Event.id == event_id).first()
+        event_exists = await db.get(Event, event_id)
         if not event_exists:
             raise HTTPException(status_code=404, detail="Мероприятие не найдено")
 
-        project_office = db.query(ProjectOffice).filter(
-            ProjectOffice.leader_uid == current_user.id
-        ).first()
+        project_office = await db.scalar(
+            select(ProjectOffice.id).filter(ProjectOffice.leader_uid == current_user.id).limit(1)
+        )
         if not project_office:
             raise HTTPException(status_code=404, detail="Проектный офис не найден")
 
@@ -270,7 +274,7 @@ def get_project_office_journal(
 @router.get("/events")
 def get_project_office_events(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_principal)
 ):
     """
     Получить список мероприятий доступных для проектного офиса
@@ -310,7 +314,7 @@ def get_project_office_events(
 @router.get("/groups")
 def get_project_office_groups(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_principal)
 ):
     """
     Получить список классов под управлением проектного офиса
@@ -331,15 +335,15 @@ def get_project_office_groups(
         p_office_group_association.c.p_office_id == project_office.id
     ).order_by(Group.name).all()
 
+    # Количество учеников и классные руководители - одним пакетом
+    stats = roster_stats_service.get_stats(db, [group.name for group in groups])
+
     return [
         {
             "id": group.id,
             "name": group.name,
-            "student_count": db.query(User).filter(
-                User.group_name == group.name,
-                User.archived == False
-            ).count(),
-            "leader_name": group.leader_name if hasattr(group, 'leader_name') else None
+            "student_count": stats[group.name].active_count,
+            "leader_name": stats[group.name].class_teacher
         }
         for group in groups
     ]
@@ -348,39 +352,43 @@ def get_project_office_groups(
 
 
 @router.get("/pivot-data-optimized")
-def get_project_office_pivot_data_optimized(
+async def get_project_office_pivot_data_optimized(
         groups: List[str] = Query(None),
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_active_user)
+        aggregation: Literal["python", "sql"] = Query("python"),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(get_current_active_principal)
 ):
 
     """
     Супер-оптимизированная версия pivot-data (без leader_name)
+    aggregation=sql - итоги по стадиям и мероприятиям считает PostgreSQL,
+    в ответ приходит одна готовая строка на ученика
     """
     # 1. Получаем проектный офис
-    project_office = db.query(ProjectOffice).filter(
-        ProjectOffice.leader_uid == current_user.id
-    ).first()
+    project_office_id = await db.scalar(
+        select(ProjectOffice.id).filter(ProjectOffice.leader_uid == current_user.id).limit(1)
+    )
 
-    if not project_office:
+    if not project_office_id:
         raise HTTPException(status_code=404, detail="Проектный офис не найден")
 
+    if aggregation == "sql":
+        rows = (await db.execute(_pivot_aggregated_query(project_office_id, groups))).all()
+        return _aggregated_pivot(rows)
+
     # 2. Один сложный запрос для получения всех данных (без leader_name)
-    query = db.query(
-        User.id.label('student_id'),
-        User.display_name,
-        User.group_name,
-        Event.id.label('event_id'),
-        Event.title.label('event_title'),
-        EventType.id.label('event_type_id'),
-        EventType.min_stages_for_completion,
-        Stage.id.label('stage_id'),
-        Stage.title.label('stage_title'),
-        Stage.min_score_for_finished,
-        Stage.stage_order,
-        PossibleResult.points_for_done,
-        Achievement.achieved_at
-    ).select_from(User) \
+    rows = (await db.execute(_pivot_rows_query(project_office_id, groups))).all()
+
+    if not rows:
+        return []
+
+    # 3. Группируем данные
+    return _build_pivot(rows)
+
+
+def _pivot_source_query(columns, project_office_id: int, groups: Optional[List[str]]):
+    """Строки (ученик, мероприятие, стадия) проектного офиса с результатами"""
+    query = columns.select_from(User) \
         .join(Group, User.group_name == Group.name) \
         .join(p_office_group_association, Group.id == p_office_group_association.c.group_id) \
         .join(ProjectOffice, p_office_group_association.c.p_office_id == ProjectOffice.id) \
@@ -395,7 +403,7 @@ def get_project_office_pivot_data_optimized(
     )) \
         .outerjoin(PossibleResult, Achievement.result_id == PossibleResult.id) \
         .filter(
-        ProjectOffice.id == project_office.id,
+        ProjectOffice.id == project_office_id,
         Event.is_active == True,
         User.archived == False
     )
@@ -403,88 +411,191 @@ def get_project_office_pivot_data_optimized(
     if groups:
         query = query.filter(User.group_name.in_(groups))
 
-    query = query.order_by(User.group_name, User.display_name, Event.title, Stage.stage_order)
-
-    rows = query.all()
-
-    if not rows:
-        return []
+    return query
+
+
+def _pivot_rows_query(project_office_id: int, groups: Optional[List[str]]):
+    """Строки (ученик, мероприятие, стадия) для сборки pivot в Python (_build_pivot)"""
+    return _pivot_source_query(
+        select(
+            User.id.label('student_id'),
+            User.display_name,
+            User.group_name,
+            Event.id.label('event_id'),
+            Event.title.label('event_title'),
+            EventType.id.label('event_type_id'),
+            EventType.min_stages_for_completion,
+            Stage.id.label('stage_id'),
+            Stage.title.label('stage_title'),
+            Stage.min_score_for_finished,
+            Stage.stage_order,
+            PossibleResult.points_for_done,
+            Achievement.achieved_at
+        ),
+        project_office_id,
+        groups
+    ).order_by(User.group_name, User.display_name, User.id, Event.title, Stage.stage_order, Stage.id)
+
+
+def _pivot_aggregated_query(project_office_id: int, groups: Optional[List[str]]):
+    """
+    Pivot целиком на стороне PostgreSQL:
+    стадии -> jsonb_agg по мероприятию -> jsonb_object_agg по ученику
+    """
+    stage_rows = _pivot_stage_rows_query(project_office_id, groups).cte('pivot_stage_rows')
+
+    total_score = func.sum(stage_rows.c.current_score)
+    completed_count = func.count().filter(stage_rows.c.is_completed)
+    event_rows = select(
+        stage_rows.c.student_id,
+        stage_rows.c.display_name,
+        stage_rows.c.group_name,
+        stage_rows.c.event_id,
+        func.jsonb_build_object(
+            'event_name', stage_rows.c.event_title,
+            'total_score', total_score,
+            'completed_stages_count', completed_count,
+            'min_stages_required', stage_rows.c.min_stages_required,
+            'stages', func.jsonb_agg(aggregate_order_by(
+                func.jsonb_build_object(
+                    'name', stage_rows.c.stage_title,
+                    'status', case((stage_rows.c.is_completed, 'зачет'), else_='незачет'),
+                    'current_score', stage_rows.c.current_score
+                ),
+                stage_rows.c.stage_order,
+                stage_rows.c.stage_id
+            )),
+            'status', case(
+                (completed_count >= stage_rows.c.min_stages_required, 'зачет'),
+                (total_score > 0, 'в процессе'),
+                else_='не начато'
+            )
+        ).label('event_data')
+    ).group_by(
+        stage_rows.c.student_id,
+        stage_rows.c.display_name,
+        stage_rows.c.group_name,
+        stage_rows.c.event_id,
+        stage_rows.c.event_title,
+        stage_rows.c.min_stages_required
+    ).cte('pivot_event_rows')
+
+    return select(
+        event_rows.c.student_id,
+        event_rows.c.display_name,
+        event_rows.c.group_name,
+        func.jsonb_object_agg(
+            cast(event_rows.c.event_id, Text), event_rows.c.event_data, type_=JSONB
+        ).label('events')
+    ).group_by(
+        event_rows.c.student_id,
+        event_rows.c.display_name,
+        event_rows.c.group_name
+    ).order_by(event_rows.c.group_name, event_rows.c.display_name, event_rows.c.student_id)
+
+
+def _pivot_stage_rows_query(project_office_id: int, groups: Optional[List[str]]):
+    """
+    Стадии для агрегации в PostgreSQL, по одной строке на (ученик, мероприятие, стадия)
+    Связи офиса с классами и мероприятиями не уникальны, поэтому без DISTINCT стадия
+    попала бы в итоги несколько раз (_build_pivot такие повторы пропускает по stage_id)
+    """
+    current_score = func.coalesce(PossibleResult.points_for_done, 0)
+    return _pivot_source_query(
+        select(
+            User.id.label('student_id'),
+            User.display_name,
+            User.group_name,
+            Event.id.label('event_id'),
+            Event.title.label('event_title'),
+            func.coalesce(EventType.min_stages_for_completion, 0).label('min_stages_required'),
+            Stage.id.label('stage_id'),
+            Stage.title.label('stage_title'),
+            Stage.stage_order,
+            current_score.label('current_score'),
+            (current_score >= func.coalesce(Stage.min_score_for_finished, 0)).label('is_completed')
+        ),
+        project_office_id,
+        groups
+    ).distinct()
+
+
+def _aggregated_pivot(rows) -> list:
+    """Ответ pivot из строк _pivot_aggregated_query (мероприятия уже собраны в PostgreSQL)"""
+    return [
+        {
+            "id": row.student_id,
+            "student_name": row.display_name or f"Ученик {row.student_id}",
+            "group_name": row.group_name,
+            "class_teacher": None,
+            "events": row.events,
+        }
+        for row in rows
+    ]
 
-    # 3. Группируем данные
-    from collections import defaultdict
-    result_map = defaultdict(lambda: {
-        "id": None,
-        "student_name": None,
-        "group_name": None,
-        "class_teacher": None,  # Оставляем как None или убираем
-        "events": defaultdict(lambda: {
-            "event_name": None,
-            "total_score": 0,
-            "completed_stages_count": 0,
-            "min_stages_required": 0,
-            "stages": [],
-            "status": "не начато"
-        })
-    })
 
-    # Собираем информацию о минимальных требованиях
-    event_min_requirements = {}
+def _build_pivot(rows) -> list:
+    """
+    Сборка pivot-данных из строк (ученик, мероприятие, стадия) за один проход
+    Ученики, мероприятия и стадии адресуются по id, без линейных поисков;
+    строки одного ученика и мероприятия идут подряд (ORDER BY), поиск мероприятия - только при смене пары
+    """
+    students = {}
+    # student_id -> {event_id: (данные мероприятия, id уже учтенных стадий)}
+    student_events = {}
+    last_key = None
+    event_data = seen_stage_ids = None
 
     for row in rows:
-        student_key = row.student_id
-        event_key = str(row.event_id)
-
-        # Инициализируем студента
-        if result_map[student_key]["id"] is None:
-            result_map[student_key].update({
-                "id": row.student_id,
-                "student_name": row.display_name or f"Ученик {row.student_id}",
-                "group_name": row.group_name,
-                # class_teacher оставляем как None или убираем
-            })
+        key = (row.student_id, row.event_id)
+        if key != last_key:
+            last_key = key
+            events = student_events.get(row.student_id)
+            if events is None:
+                events = student_events[row.student_id] = {}
+                students[row.student_id] = {
+                    "id": row.student_id,
+                    "student_name": row.display_name or f"Ученик {row.student_id}",
+                    "group_name": row.group_name,
+                    "class_teacher": None,
+                    "events": {},
+                }
+
+            entry = events.get(row.event_id)
+            if entry is None:
+                event_data = {
+                    "event_name": row.event_title,
+                    "total_score": 0,
+                    "completed_stages_count": 0,
+                    "min_stages_required": row.min_stages_for_completion or 0,
+                    "stages": [],
+                    "status": "не начато",
+                }
+                students[row.student_id]["events"][str(row.event_id)] = event_data
+                entry = events[row.event_id] = (event_data, set())
+            event_data, seen_stage_ids = entry
+
+        if row.stage_id in seen_stage_ids:
+            continue
+        seen_stage_ids.add(row.stage_id)
 
-        # Инициализируем мероприятие
-        event_data = result_map[student_key]["events"][event_key]
-        if event_data["event_name"] is None:
-            event_data.update({
-                "event_name": row.event_title,
-                "min_stages_required": row.min_stages_for_completion or 0
-            })
-            event_min_requirements[event_key] = row.min_stages_for_completion or 0
-
-        # Добавляем стадию
         current_score = row.points_for_done or 0
-        status = "зачет" if current_score >= (row.min_score_for_finished or 0) else "незачет"
-
-        # Проверяем, не добавлена ли уже эта стадия
-        stage_exists = any(stage.get("name") == row.stage_title for stage in event_data["stages"])
-        if not stage_exists:
-            event_data["stages"].append({
-                "name": row.stage_title,
-                "status": status,
-                "current_score": current_score
-            })
-
-            # Обновляем общие показатели
-            event_data["total_score"] += current_score
-            if status == "зачет":
-                event_data["completed_stages_count"] += 1
-
-    # 4. Определяем финальные статусы мероприятий
-    for student_data in result_map.values():
-        for event_key, event_data in student_data["events"].items():
-            min_required = event_min_requirements.get(event_key, len(event_data["stages"]))
-
-            if event_data["completed_stages_count"] >= min_required:
+        is_completed = current_score >= (row.min_score_for_finished or 0)
+        event_data["stages"].append({
+            "name": row.stage_title,
+            "status": "зачет" if is_completed else "незачет",
+            "current_score": current_score
+        })
+        event_data["total_score"] += current_score
+        if is_completed:
+            event_data["completed_stages_count"] += 1
+
+    # Итоговые статусы мероприятий
+    for events in student_events.values():
+        for event_data, _ in events.values():
+            if event_data["completed_stages_count"] >= event_data["min_stages_required"]:
                 event_data["status"] = "зачет"
             elif event_data["total_score"] > 0:
                 event_data["status"] = "в процессе"
-            # else остается "не начато"
-
-            # Конвертируем defaultdict в обычный dict
-            student_data["events"][event_key] = dict(event_data)
-
-        # Конвертируем events в обычный dict
-        student_data["events"] = dict(student_data["events"])
 
-    return list(result_map.values())
+    return list(students.values())
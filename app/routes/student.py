@@ -4,13 +4,15 @@ from typing import Optional, List
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database.database import get_db
+from app.database.database import get_db, get_async_db
 from fastapi import APIRouter, Depends, HTTPException
 
 from app.database.models import User, ProjectOffice, Group
 
-from app.auth.dependencies import get_current_active_user, get_current_user
+from app.auth.dependencies import get_current_active_principal
+from app.auth.principal_cache import Principal
 from app.routes.mark_book import RecordBookResponse, get_student_record_book_marks_optimized
 from app.services.SchoolServices import SchoolService
 
@@ -47,11 +49,11 @@ class StudentInfoResponse(BaseModel):
 
 @router.get("/", response_model=StudentInfoResponse)
 def get_student_info(
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_principal),
     db: Session = Depends(get_db)
 ) -> StudentInfoResponse:
 
-    if not ('student' in [role.name for role in current_user.roles]):
+    if not current_user.has_role('student'):
         raise HTTPException(status_code=401, detail="Нет доступа в соответствии с ролью")
     projects_office = db.query(ProjectOffice) \
         .join(ProjectOffice.accessible_classes) \
@@ -98,8 +100,8 @@ def get_student_info(
 
 
 @router.get("/project_office", response_model=ProjectOfficeResponse)
-def get_project_office_info(current_user: User = Depends(get_current_active_user),  db: Session = Depends(get_db)):
-    if not ('student'in [role.name for role in current_user.roles]):
+def get_project_office_info(current_user: Principal = Depends(get_current_active_principal),  db: Session = Depends(get_db)):
+    if not current_user.has_role('student'):
         raise HTTPException(status_code=401, detail="Нет доступа в соответствии с ролью")
     projects_office = db.query(ProjectOffice).join(ProjectOffice.accessible_classes).filter(Group.name==current_user.group_name).first()
 
@@ -110,12 +112,12 @@ def get_project_office_info(current_user: User = Depends(get_current_active_user
 
 
 @router.get("/record-book/marks", response_model=RecordBookResponse)
-def get_record_book_marks(
-        current_user: User = Depends(get_current_active_user),
-        db: Session = Depends(get_db)
+async def get_record_book_marks(
+        current_user: Principal = Depends(get_current_active_principal),
+        db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        mark_book = get_student_record_book_marks_optimized(db, current_user.id, current_user.group_name)
+        mark_book = await get_student_record_book_marks_optimized(db, current_user.id, current_user.group_name)
     except HTTPException as err:
         raise HTTPException(status_code=404, detail=str(err))
     return mark_book
\ No newline at end of file
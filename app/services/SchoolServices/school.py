@@ -1,4 +1,3 @@
-import mysql.connector
 from mysql.connector import Error
 import requests
 
@@ -7,7 +6,8 @@ import requests
 from pydantic import BaseModel
 from typing import Optional
 
-from sqlalchemy.dialects.mysql import aiomysql
+from app.services.SchoolServices.school_db import school_db_pool
+from app.services.SchoolServices.teacher_roster import teacher_roster_cache
 
 
 #модели
@@ -37,30 +37,18 @@ class GroupLeaderResponse(BaseModel):
     email:Optional[str] = None
 
 class SchoolService:
-    def __init__(self):
-        self.connection_params = {
-            'host': '192.168.20.61',
-            'database': 'students',
-            'user': 'pass_system',
-            'password': 'ktSXPOr2ekCGS4cr'
-        }
-        self.response = requests.get('https://school1298.ru/portal/workers/workersPS-no.json', timeout=10)
-
     def _check_teacher(self, email):
         """Проверка учителя через внешний API"""
         try:
-            self.response.raise_for_status()
-            teachers_data = self.response.json()
-            for i in teachers_data.get('value'):
-
-                if i['email'] == email:
-                    return User(
-                        uid=str(i.get('Id')),
-                        display_name=i.get('name'),
-                        image=i.get('image'),
-                        leader_classes=str(i.get('classStr')).split(',') if i.get('classStr') else None,
-                        role='teacher',
-                    )
+            i = teacher_roster_cache.get().find_by_email(email)
+            if i:
+                return User(
+                    uid=str(i.get('Id')),
+                    display_name=i.get('name'),
+                    image=i.get('image'),
+                    leader_classes=str(i.get('classStr')).split(',') if i.get('classStr') else None,
+                    role='teacher',
+                )
             return None
         except requests.RequestException as e:
             return None
@@ -69,13 +57,14 @@ class SchoolService:
 
     def _check_student(self, email):
         """Проверка студента в базе данных"""
-        conn = None
-        cursor = None
         try:
-            conn = mysql.connector.connect(**self.connection_params)
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM students WHERE email = %s AND archive=0", (email,))
-            result = cursor.fetchone()
+            with school_db_pool.connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                try:
+                    cursor.execute("SELECT * FROM students WHERE email = %s AND archive=0", (email,))
+                    result = cursor.fetchone()
+                finally:
+                    cursor.close()
             print(result.get('personid'))
             return User(
                 uid=result.get('personid'),
@@ -87,12 +76,6 @@ class SchoolService:
             )
         except Error as e:
             return None
-        finally:
-            # Всегда закрываем ресурсы в блоке finally
-            if cursor:
-                cursor.close()
-            if conn and conn.is_connected():
-                conn.close()
     def check_user_in_school_db(self, email: str):
 
 
@@ -137,13 +120,14 @@ class SchoolService:
                 )
     def get_student_data(self, uid):
         """Почучение студента из БД"""
-        conn = None
-        cursor = None
         try:
-            conn = mysql.connector.connect(**self.connection_params)
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM students WHERE personid = %s AND archive=0", (uid,))
-            result = cursor.fetchone()
+            with school_db_pool.connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                try:
+                    cursor.execute("SELECT * FROM students WHERE personid = %s AND archive=0", (uid,))
+                    result = cursor.fetchone()
+                finally:
+                    cursor.close()
             return StudentResponse(
                 uid=result.get('personid'),
                 display_name=result.get('firstName')+' '+ result.get('lastName') +' '+ result.get('patronymic'),
@@ -151,28 +135,18 @@ class SchoolService:
             )
         except Error as e:
             return None
-        finally:
-            # Всегда закрываем ресурсы в блоке finally
-            if cursor:
-                cursor.close()
-            if conn and conn.is_connected():
-                conn.close()
 
     def get_project_leader_by_external_id(self, external_id):
         """Получение студента из БД"""
         try:
-            self.response.raise_for_status()
-            teachers_data = self.response.json()
-
-            for teacher in teachers_data.get('value', []):
-
-                if external_id in teacher.get('Id'):
-                    return GroupLeaderResponse(
-                        uid=str(teacher.get('Id')),
-                        display_name=teacher.get('name'),
-                        email=teacher.get('email'),
-                        image=f"https://school1298.ru/portal/workers/image/teachers/{teacher.get('image')}"
-                    )
+            teacher = teacher_roster_cache.get().find_by_id(external_id)
+            if teacher:
+                return GroupLeaderResponse(
+                    uid=str(teacher.get('Id')),
+                    display_name=teacher.get('name'),
+                    email=teacher.get('email'),
+                    image=f"https://school1298.ru/portal/workers/image/teachers/{teacher.get('image')}"
+                )
             return None
 
         except (requests.RequestException, Exception):
@@ -181,21 +155,14 @@ class SchoolService:
     def get_group_leader_by_class_name(self, group_name):
         """Получение студента из БД"""
         try:
-            self.response.raise_for_status()
-            teachers_data = self.response.json()
-
-            for teacher in teachers_data.get('value', []):
-                class_str = teacher.get('classStr')
-                if class_str and group_name in class_str.split(','):
-                    print('11111111111111111111111100000000000')
-                    print(teacher)
-
-                    return GroupLeaderResponse(
-                        uid=str(teacher.get('Id')),
-                        display_name=teacher.get('name'),
-                        email=teacher.get('email'),
-                        image=f"https://school1298.ru/portal/workers/image/teachers/{teacher.get('image')}"
-                    )
+            teacher = teacher_roster_cache.get().find_by_class(group_name)
+            if teacher:
+                return GroupLeaderResponse(
+                    uid=str(teacher.get('Id')),
+                    display_name=teacher.get('name'),
+                    email=teacher.get('email'),
+                    image=f"https://school1298.ru/portal/workers/image/teachers/{teacher.get('image')}"
+                )
             return None
 
         except (requests.RequestException, Exception):
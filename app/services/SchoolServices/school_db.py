@@ -0,0 +1,87 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
+
+from app.core.config import settings
+
+
+class SchoolDatabasePool:
+    """
+    Общий пул соединений с MySQL базой школы (students)
+    - создается при первом обращении
+    - размер ограничен SCHOOL_DB_POOL_SIZE; при нехватке соединений ждем до SCHOOL_DB_POOL_TIMEOUT
+      (сам mysql.connector при исчерпании пула сразу бросает PoolError)
+    - перед выдачей соединение проверяется ping с переподключением
+    """
+
+    def __init__(self, pool_size: int, timeout: int):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._pool: Optional[pooling.MySQLConnectionPool] = None
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def missing_settings() -> List[str]:
+        """Незаданные обязательные настройки подключения"""
+        return [
+            name for name in ("SCHOOL_DB_HOST", "SCHOOL_DB_USER", "SCHOOL_DB_PASSWORD")
+            if not getattr(settings, name)
+        ]
+
+    def _get_pool(self) -> pooling.MySQLConnectionPool:
+        if self._pool is None:
+            missing = self.missing_settings()
+            if missing:
+                raise RuntimeError(f"Не заданы настройки БД школы: {', '.join(missing)}")
+
+            with self._lock:
+                if self._pool is None:
+                    self._pool = pooling.MySQLConnectionPool(
+                        pool_name=f"school_db_{os.getpid()}",
+                        pool_size=self.pool_size,
+                        pool_reset_session=True,
+                        # Недочитанный результат (досрочный выход из потокового чтения) дочитывается при возврате
+                        consume_results=True,
+                        host=settings.SCHOOL_DB_HOST,
+                        port=settings.SCHOOL_DB_PORT,
+                        database=settings.SCHOOL_DB_NAME,
+                        user=settings.SCHOOL_DB_USER,
+                        password=settings.SCHOOL_DB_PASSWORD,
+                    )
+        return self._pool
+
+    @contextmanager
+    def connection(self):
+        """Соединение из пула; по выходе из блока возвращается в пул"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError(f"Нет свободных соединений с БД школы за {self.timeout} сек.")
+
+        connection = None
+        try:
+            connection = self._get_pool().get_connection()
+            connection.ping(reconnect=True, attempts=2, delay=0)
+            yield connection
+        finally:
+            if connection is not None:
+                connection.close()
+            self._slots.release()
+
+    def reset(self):
+        """Сброс пула в дочернем процессе: соединения родителя не используются"""
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._lock = threading.Lock()
+
+
+school_db_pool = SchoolDatabasePool(
+    pool_size=settings.SCHOOL_DB_POOL_SIZE,
+    timeout=settings.SCHOOL_DB_POOL_TIMEOUT,
+)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=school_db_pool.reset)
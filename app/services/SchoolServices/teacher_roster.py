@@ -0,0 +1,143 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from app.core.config import settings
+
+
+class TeacherRoster:
+    """Снимок списка сотрудников портала с индексами для поиска за O(1)"""
+
+    def __init__(self, records: List[dict]):
+        self.records = records
+        self.by_email: Dict[str, dict] = {}
+        self.by_id: Dict[str, dict] = {}
+        self.by_class: Dict[str, dict] = {}
+
+        for record in records:
+            email = (record.get('email') or '').strip().lower()
+            if email:
+                self.by_email.setdefault(email, record)
+
+            if record.get('Id'):
+                self.by_id.setdefault(str(record.get('Id')), record)
+
+            # Классный руководитель - первый сотрудник с классом в classStr
+            for class_name in (record.get('classStr') or '').split(','):
+                if class_name.strip():
+                    self.by_class.setdefault(class_name.strip(), record)
+
+    def find_by_email(self, email: str) -> Optional[dict]:
+        return self.by_email.get((email or '').strip().lower())
+
+    def find_by_id(self, external_id) -> Optional[dict]:
+        return self.by_id.get(str(external_id))
+
+    def find_by_class(self, class_name: str) -> Optional[dict]:
+        return self.by_class.get((class_name or '').strip())
+
+
+class TeacherRosterCache:
+    """
+    Общий кэш списка сотрудников (workersPS-no.json)
+    - свежие данные отдаются из памяти TEACHER_ROSTER_TTL_SECONDS
+    - после TTL запрос условный (If-None-Match / If-Modified-Since), 304 продлевает снимок без разбора JSON
+    - в окне TEACHER_ROSTER_STALE_SECONDS устаревший снимок отдается сразу, обновление идет в фоне
+    """
+
+    def __init__(self, url: str, ttl_seconds: int, stale_seconds: int, timeout: int = 10):
+        self.url = url
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.timeout = timeout
+        self._roster: Optional[TeacherRoster] = None
+        self._fetched_at = 0.0
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self, revalidate: bool = False) -> TeacherRoster:
+        """
+        Снимок списка сотрудников
+        revalidate=True - всегда сверить с порталом (синхронизация), иначе TTL и stale-while-revalidate
+        Ошибка загрузки при отсутствии снимка пробрасывается
+        """
+        with self._lock:
+            roster = self._roster
+            age = time.monotonic() - self._fetched_at
+
+        if roster is not None and not revalidate:
+            if age < self.ttl_seconds:
+                return roster
+            if age < self.ttl_seconds + self.stale_seconds:
+                self._refresh_in_background()
+                return roster
+
+        try:
+            return self._refresh()
+        except Exception as e:
+            if roster is None:
+                raise
+            print(f"⚠️  Список сотрудников не обновлен, используется сохраненный: {e}")
+            return roster
+
+    def invalidate(self):
+        with self._lock:
+            self._fetched_at = 0.0
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"⚠️  Ошибка фонового обновления списка сотрудников: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=refresh, name="teacher-roster-refresh", daemon=True).start()
+
+    def _refresh(self) -> TeacherRoster:
+        # Одновременно к порталу идет один запрос
+        with self._refresh_lock:
+            headers = {}
+            with self._lock:
+                if self._roster is not None:
+                    if self._etag:
+                        headers['If-None-Match'] = self._etag
+                    if self._last_modified:
+                        headers['If-Modified-Since'] = self._last_modified
+
+            response = requests.get(self.url, headers=headers, timeout=self.timeout)
+
+            if response.status_code == 304:
+                with self._lock:
+                    self._fetched_at = time.monotonic()
+                    return self._roster
+
+            response.raise_for_status()
+            roster = TeacherRoster(response.json().get('value', []))
+
+            with self._lock:
+                self._roster = roster
+                self._fetched_at = time.monotonic()
+                self._etag = response.headers.get('ETag')
+                self._last_modified = response.headers.get('Last-Modified')
+
+            return roster
+
+
+teacher_roster_cache = TeacherRosterCache(
+    url=settings.TEACHER_ROSTER_URL,
+    ttl_seconds=settings.TEACHER_ROSTER_TTL_SECONDS,
+    stale_seconds=settings.TEACHER_ROSTER_STALE_SECONDS,
+)
@@ -0,0 +1,107 @@
+import os
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.database.database import engine
+from app.database.models import EmailLog
+
+
+class EmailLogWriter:
+    """
+    Буферизованная запись журнала писем (email_logs)
+    Строки копятся в памяти и пишутся пакетом (executemany) на отдельном соединении:
+    при EMAIL_LOG_BATCH_SIZE строк или раз в EMAIL_LOG_FLUSH_SECONDS
+    Сессии запросов и очередь отправки не ждут коммитов журнала
+    """
+
+    # Сколько строк держать, если БД недоступна (старые отбрасываются)
+    MAX_BUFFER_SIZE = 10000
+
+    def __init__(self, batch_size: int, flush_seconds: int):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._buffer: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def write(
+            self,
+            email: str,
+            subject: str,
+            template_name: Optional[str],
+            status: str,
+            error_message: Optional[str] = None,
+            sent_at: Optional[datetime] = None
+    ):
+        self.write_many([{
+            "email": email,
+            "subject": subject,
+            "template_name": template_name,
+            "status": status,
+            "error_message": error_message,
+            "sent_at": sent_at or datetime.now(),
+        }])
+
+    def write_many(self, rows: List[dict]):
+        self._ensure_thread()
+        with self._lock:
+            self._buffer.extend(rows)
+            full = len(self._buffer) >= self.batch_size
+
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Запись накопленных строк одним пакетом"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return
+
+            try:
+                with engine.begin() as connection:
+                    connection.execute(insert(EmailLog.__table__), rows)
+            except Exception as e:
+                print(f"❌ Ошибка записи журнала писем ({len(rows)} строк): {e}")
+                # Возвращаем строки в буфер до следующей попытки
+                with self._lock:
+                    self._buffer = (rows + self._buffer)[-self.MAX_BUFFER_SIZE:]
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self._run, name="email-log-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+    def reset(self):
+        """Сброс в дочернем процессе после fork"""
+        self._buffer = []
+        self._thread = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+
+email_log_writer = EmailLogWriter(
+    batch_size=settings.EMAIL_LOG_BATCH_SIZE,
+    flush_seconds=settings.EMAIL_LOG_FLUSH_SECONDS,
+)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=email_log_writer.reset)
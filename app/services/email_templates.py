@@ -0,0 +1,89 @@
+import html
+import os
+import re
+from typing import Dict, List
+
+from app.core.config import settings
+
+# Каталог шаблонов писем: <имя>.html / <имя>.txt с подстановками ${поле}
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "email")
+
+PLACEHOLDER = re.compile(r"\$\{(\w+)\}")
+
+
+def _static_fields() -> Dict[str, str]:
+    """Поля из настроек, подставляемые один раз при компиляции"""
+    return {
+        "SCHOOL_NAME": settings.SCHOOL_NAME or "",
+        "SCHOOL_DOMAIN": settings.SCHOOL_DOMAIN or "",
+        "FRONTEND_URL": settings.FRONTEND_URL or "",
+    }
+
+
+class CompiledTemplate:
+    """
+    Шаблон, разобранный на статические фрагменты и имена полей
+    Рендер - только подстановка полей пользователя и одна склейка строк
+    """
+
+    def __init__(self, name: str, source: str, static_fields: Dict[str, str], escape: bool):
+        self.name = name
+        self.escape = escape
+        self._literals: List[str] = []
+        self._fields: List[str] = []
+
+        literal = []
+        parts = PLACEHOLDER.split(source)
+        for index, part in enumerate(parts):
+            if index % 2 == 0:
+                literal.append(part)
+            elif part in static_fields:
+                value = static_fields[part]
+                literal.append(html.escape(value) if escape else value)
+            else:
+                self._literals.append("".join(literal))
+                self._fields.append(part)
+                literal = []
+        self._literals.append("".join(literal))
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self._fields)
+
+    def render(self, **values) -> str:
+        missing = set(self._fields) - values.keys()
+        if missing:
+            raise ValueError(f"Шаблон {self.name}: не переданы поля {', '.join(sorted(missing))}")
+
+        chunks = [self._literals[0]]
+        for field, literal in zip(self._fields, self._literals[1:]):
+            value = values[field]
+            value = "" if value is None else str(value)
+            chunks.append(html.escape(value) if self.escape else value)
+            chunks.append(literal)
+        return "".join(chunks)
+
+
+class EmailTemplates:
+    """Все шаблоны каталога, скомпилированные при создании"""
+
+    def __init__(self, directory: str = TEMPLATES_DIR):
+        static_fields = _static_fields()
+        self._templates: Dict[str, CompiledTemplate] = {}
+
+        for file_name in sorted(os.listdir(directory)):
+            name, extension = os.path.splitext(file_name)
+            if extension not in (".html", ".txt"):
+                continue
+            with open(os.path.join(directory, file_name), encoding="utf-8") as file:
+                source = file.read()
+            self._templates[file_name] = CompiledTemplate(
+                file_name, source, static_fields, escape=extension == ".html"
+            )
+
+    def render(self, template_name: str, **values) -> str:
+        """template_name - имя файла, например 'verification.html'"""
+        return self._templates[template_name].render(**values)
+
+
+email_templates = EmailTemplates()
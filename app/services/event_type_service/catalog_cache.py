@@ -0,0 +1,111 @@
+# app/services/event_type_service/catalog_cache.py
+import threading
+from typing import Any, Callable, Hashable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.models import EventType, Stage, PossibleResult, Event
+
+
+class LocalVersionBackend:
+    """Версия каталога в памяти процесса"""
+
+    def __init__(self):
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get_version(self) -> int:
+        return self._version
+
+    def bump(self) -> int:
+        with self._lock:
+            self._version += 1
+            return self._version
+
+
+class RedisVersionBackend:
+    """Общая версия каталога для нескольких воркеров (Redis INCR)"""
+
+    KEY = "markbook:catalog_version"
+
+    def __init__(self, url: str, key: str = KEY):
+        import redis  # опциональная зависимость, нужна только для общего бэкенда
+
+        self._client = redis.Redis.from_url(url)
+        self.key = key
+
+    def get_version(self) -> int:
+        return int(self._client.get(self.key) or 0)
+
+    def bump(self) -> int:
+        return int(self._client.incr(self.key))
+
+
+class CatalogCache:
+    """
+    Версионированный кэш каталога типов мероприятий (стадии, результаты, руководитель)
+    Любая инвалидация увеличивает версию, и все записи перестраиваются при следующем чтении
+    """
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._version: Optional[int] = None
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        version = self._backend.get_version()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                return self._entries[key]
+
+        value = loader()
+
+        with self._lock:
+            # Не сохраняем значение, если каталог успели изменить во время загрузки
+            if self._version == version:
+                self._entries[key] = value
+        return value
+
+    def invalidate(self):
+        self._backend.bump()
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+
+def _create_backend():
+    if settings.CATALOG_CACHE_REDIS_URL:
+        return RedisVersionBackend(settings.CATALOG_CACHE_REDIS_URL)
+    return LocalVersionBackend()
+
+
+catalog_cache = CatalogCache(_create_backend())
+
+_CATALOG_MODELS = (EventType, Stage, PossibleResult, Event)
+
+
+# Изменения каталога в обход EventTypeService (например, через админку)
+# сбрасывают кэш после фиксации транзакции
+@event.listens_for(Session, "after_flush")
+def _mark_catalog_changed(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, _CATALOG_MODELS):
+            session.info["catalog_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog(session):
+    if session.info.pop("catalog_changed", False):
+        catalog_cache.invalidate()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_catalog_change(session, previous_transaction):
+    session.info.pop("catalog_changed", None)
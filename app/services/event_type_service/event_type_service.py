@@ -1,48 +1,61 @@
 # app/services/event_type_service.py
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy import and_
 from typing import List, Optional
 from app.database.models import EventType, Stage, PossibleResult, User,Event
 from app.services.event_type_service.schemas import EventTypeResponse
+from app.services.event_type_service.catalog_cache import catalog_cache
 
 class EventTypeService:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_all_event_types_with_details(self) -> List[EventType]:
+    def _event_types_query(self):
+        """Запрос типов мероприятий с полным деревом: стадии -> результаты, руководитель, мероприятия"""
+        return self.db.query(EventType).options(
+            joinedload(EventType.stages).joinedload(Stage.possible_results),
+            joinedload(EventType.leader),
+            selectinload(EventType.events)
+        )
+
+    @staticmethod
+    def _to_response(event_type: EventType) -> EventTypeResponse:
+        """Снимок типа мероприятия для кэша (стадии по порядку)"""
+        response = EventTypeResponse.model_validate(event_type)
+        response.stages.sort(key=lambda stage: stage.stage_order)
+        return response
+
+    def _get_event_type_model(self, event_type_id: int) -> Optional[EventType]:
+        """ORM-объект типа мероприятия (для изменения)"""
+        return self._event_types_query().filter(EventType.id == event_type_id).first()
+
+    def get_all_event_types_with_details(self) -> List[EventTypeResponse]:
         """
         Получение всех типов мероприятий с полной информацией
         включая стадии, возможные результаты и руководителя
         """
         try:
-            event_types = (
-                self.db.query(EventType)
-                .options(
-                    joinedload(EventType.stages).joinedload(Stage.possible_results),
-                    joinedload(EventType.leader)
-                )
-                .order_by(EventType.title)
-                .all()
+            event_types = catalog_cache.get_or_load(
+                ("all",),
+                lambda: [
+                    self._to_response(event_type)
+                    for event_type in self._event_types_query().order_by(EventType.title).all()
+                ]
             )
-            return event_types
+            return list(event_types)
         except Exception as e:
             raise Exception(f"Ошибка при получении типов мероприятий: {str(e)}")
 
-    def get_event_type_by_id(self, event_type_id: int) -> Optional[EventType]:
+    def get_event_type_by_id(self, event_type_id: int) -> Optional[EventTypeResponse]:
         """
         Получение типа мероприятия по ID с полной информацией
         """
         try:
-            event_type = (
-                self.db.query(EventType)
-                .options(
-                    joinedload(EventType.stages).joinedload(Stage.possible_results),
-                    joinedload(EventType.leader)
-                )
-                .filter(EventType.id == event_type_id)
-                .first()
-            )
-            return event_type
+            def load():
+                event_type = self._get_event_type_model(event_type_id)
+                return self._to_response(event_type) if event_type else None
+
+            return catalog_cache.get_or_load(("id", event_type_id), load)
         except Exception as e:
             raise Exception(f"Ошибка при получении типа мероприятия: {str(e)}")
 
@@ -100,7 +113,7 @@ class EventTypeService:
                             self.db.add(result)
 
             self.db.commit()
-            self.db.refresh(event_type)
+            catalog_cache.invalidate()
 
             # Возвращаем созданный объект с полной информацией
             return self.get_event_type_by_id(event_type.id)
@@ -111,12 +124,12 @@ class EventTypeService:
             self.db.rollback()
             raise Exception(f"Ошибка при создании типа мероприятия: {str(e)}")
 
-    def update_event_type(self, event_type_id: int, update_data: dict) -> Optional[EventType]:
+    def update_event_type(self, event_type_id: int, update_data: dict) -> Optional[EventTypeResponse]:
         """
         Обновление типа мероприятия
         """
         try:
-            event_type = self.get_event_type_by_id(event_type_id)
+            event_type = self._get_event_type_model(event_type_id)
             if not event_type:
                 return None
 
@@ -150,7 +163,7 @@ class EventTypeService:
             # TODO: Добавить логику обновления стадий и результатов при необходимости
 
             self.db.commit()
-            self.db.refresh(event_type)
+            catalog_cache.invalidate()
 
             return self.get_event_type_by_id(event_type_id)
 
@@ -165,7 +178,7 @@ class EventTypeService:
         Удаление типа мероприятия
         """
         try:
-            event_type = self.get_event_type_by_id(event_type_id)
+            event_type = self._get_event_type_model(event_type_id)
             if not event_type:
                 return False
 
@@ -175,6 +188,7 @@ class EventTypeService:
 
             self.db.delete(event_type)
             self.db.commit()
+            catalog_cache.invalidate()
             return True
 
         except ValueError:
@@ -188,16 +202,16 @@ class EventTypeService:
         Получение типов мероприятий по ID руководителя
         """
         try:
-            event_types = (
-                self.db.query(EventType)
-                .options(
-                    joinedload(EventType.stages).joinedload(Stage.possible_results),
-                    joinedload(EventType.leader)
-                )
-                .filter(EventType.leader_id == leader_id)
-                .order_by(EventType.title)
-                .all()
+            event_types = catalog_cache.get_or_load(
+                ("leader", leader_id),
+                lambda: [
+                    self._to_response(event_type)
+                    for event_type in self._event_types_query()
+                    .filter(EventType.leader_id == leader_id)
+                    .order_by(EventType.title)
+                    .all()
+                ]
             )
-            return event_types
+            return list(event_types)
         except Exception as e:
             raise Exception(f"Ошибка при получении типов мероприятий руководителя: {str(e)}")
\ No newline at end of file
@@ -58,6 +58,9 @@ class Event(BaseModel):
     title: str
     description: Optional[str] = None
 
+    class Config:
+        from_attributes = True
+
 class EventTypeResponse(EventTypeBase):
     id: int
     stages: List[StageResponse]
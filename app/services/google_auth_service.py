@@ -1,11 +1,149 @@
+import asyncio
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
 import httpx
-from google.auth.transport import requests
-from google.oauth2 import id_token
+from google.auth import jwt
 from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.database.models import User
 from app.services.user_service import UserService
 
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# Срок хранения сертификатов, если Google не прислал Cache-Control
+DEFAULT_CERTS_MAX_AGE = 3600
+
+# Не чаще этого интервала перезагружаем сертификаты из-за неизвестного kid (ротация ключей)
+CERTS_FORCE_REFRESH_INTERVAL = 60
+
+# Допустимое расхождение часов при проверке iat/exp
+CLOCK_SKEW_SECONDS = 10
+
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Общий для процесса HTTP-клиент с пулом соединений к Google"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=settings.GOOGLE_HTTP_TIMEOUT_SECONDS)
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    client, _http_client = _http_client, None
+    if client is not None:
+        await client.aclose()
+
+
+class GoogleCertStore:
+    """
+    Сертификаты подписи ID token Google (kid -> PEM)
+    - хранятся до истечения Cache-Control: max-age (за вычетом Age)
+    - одновременные запросы при истечении ждут одну загрузку
+    - неизвестный kid (ротация ключей) вызывает внеочередную загрузку
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def get(self, kid: Optional[str] = None) -> Dict[str, str]:
+        if self._is_fresh(kid):
+            return self._certs
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Пока ждали, сертификаты мог загрузить другой запрос
+            if not self._is_fresh(kid):
+                await self._fetch()
+        return self._certs
+
+    def _is_fresh(self, kid: Optional[str]) -> bool:
+        now = time.monotonic()
+        if not self._certs or now >= self._expires_at:
+            return False
+        if kid and kid not in self._certs:
+            return now - self._fetched_at < CERTS_FORCE_REFRESH_INTERVAL
+        return True
+
+    async def _fetch(self):
+        response = await get_http_client().get(self.url)
+        response.raise_for_status()
+
+        self._certs = response.json()
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + self._max_age(response.headers)
+        print(f"🔑 Google certs loaded: {len(self._certs)} keys")
+
+    @staticmethod
+    def _max_age(headers: httpx.Headers) -> int:
+        match = MAX_AGE_PATTERN.search(headers.get("cache-control", ""))
+        if not match:
+            return DEFAULT_CERTS_MAX_AGE
+        age = int(headers.get("age", 0) or 0)
+        return max(int(match.group(1)) - age, 0)
+
+
+class GoogleClaimsCache:
+    """TTL/LRU кэш проверенных токенов: sha256(токен) -> данные пользователя"""
+
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._items: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, claims = item
+        if expires_at < time.time():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return claims
+
+    def set(self, token: str, claims: dict, token_expires_at: Optional[float] = None):
+        """token_expires_at - unix-время истечения токена: кэш не переживает сам токен"""
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        if self.ttl_seconds <= 0 or expires_at <= time.time():
+            return
+
+        key = self._key(token)
+        self._items[key] = (expires_at, claims)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+
+google_cert_store = GoogleCertStore(settings.GOOGLE_CERTS_URL)
+google_claims_cache = GoogleClaimsCache(
+    ttl_seconds=settings.GOOGLE_TOKEN_CACHE_TTL_SECONDS,
+    max_size=settings.GOOGLE_TOKEN_CACHE_MAX_SIZE,
+)
+
 
 class GoogleAuthService:
 
@@ -13,80 +151,105 @@ class GoogleAuthService:
     async def verify_google_token(token: str) -> dict:
         """
         Универсальная верификация Google токена (ID token или access token)
+        Повторный вход с тем же токеном отдается из кэша, ID token проверяется локально
         """
+        claims = google_claims_cache.get(token)
+        if claims is not None:
+            return claims
+
         try:
             print(f"🔍 Verifying Google token (length: {len(token)})...")
 
-            # Сначала пробуем верифицировать как ID token
-            try:
-                idinfo = id_token.verify_oauth2_token(
-                    token,
-                    requests.Request(),
-                    settings.GOOGLE_CLIENT_ID
-                )
-                print("✅ Successfully verified as ID token")
-                return idinfo
-            except ValueError as id_token_error:
-                print(f"⚠️ Not an ID token: {str(id_token_error)}")
+            # ID token - JWT из трех частей, access token - нет
+            if token.count(".") == 2:
+                try:
+                    idinfo = await GoogleAuthService.verify_id_token(token)
+                    print("✅ Successfully verified as ID token")
+                    google_claims_cache.set(token, idinfo, idinfo.get("exp"))
+                    return idinfo
+                except ValueError as id_token_error:
+                    print(f"⚠️ Not an ID token: {str(id_token_error)}")
 
-                # Если не ID token, пробуем использовать как access token
-                print("🔄 Trying to verify as access token...")
-                return await GoogleAuthService.verify_access_token(token)
+            # Если не ID token, пробуем использовать как access token
+            print("🔄 Trying to verify as access token...")
+            return await GoogleAuthService.verify_access_token(token)
 
         except Exception as e:
             print(f"❌ Token verification failed: {str(e)}")
             raise ValueError(f"Invalid Google token: {str(e)}")
 
+    @staticmethod
+    async def verify_id_token(token: str) -> dict:
+        """
+        Проверка подписи, audience, срока действия и издателя ID token
+        по закэшированным сертификатам Google
+        """
+        kid = jwt.decode_header(token).get("kid")
+        certs = await google_cert_store.get(kid)
+
+        idinfo = jwt.decode(
+            token,
+            certs=certs,
+            audience=settings.GOOGLE_CLIENT_ID,
+            clock_skew_in_seconds=CLOCK_SKEW_SECONDS
+        )
+        if idinfo.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {idinfo.get('iss')}")
+        return idinfo
+
     @staticmethod
     async def verify_access_token(access_token: str) -> dict:
         """
         Верификация Google access token через Google API
+        tokeninfo и userinfo запрашиваются параллельно по общему HTTP-клиенту
         """
         try:
             print("🔍 Verifying access token via Google API...")
 
-            async with httpx.AsyncClient() as client:
-                # Вариант 1: Получаем информацию о токене
-                token_info_response = await client.get(
-                    f"https://www.googleapis.com/oauth2/v1/tokeninfo?access_token={access_token}"
+            client = get_http_client()
+            token_info_response, user_info_response = await asyncio.gather(
+                client.get(settings.GOOGLE_TOKENINFO_URL, params={"access_token": access_token}),
+                client.get(
+                    settings.GOOGLE_USERINFO_URL,
+                    headers={"Authorization": f"Bearer {access_token}"}
                 )
+            )
+
+            if token_info_response.status_code != 200:
+                error_detail = token_info_response.json()
+                raise ValueError(f"Invalid access token: {error_detail.get('error_description', 'Unknown error')}")
+
+            token_info = token_info_response.json()
+
+            # Проверяем, что токен действителен и для нашего client_id
+            if token_info.get('audience') != settings.GOOGLE_CLIENT_ID:
+                raise ValueError("Token audience does not match our client ID")
+
+            if user_info_response.status_code != 200:
+                raise ValueError("Failed to get user info")
+
+            user_info = user_info_response.json()
+            print(f"✅ Access token verified: {user_info.get('email')}")
+
+            # Форматируем в тот же формат, что и ID token
+            claims = {
+                'sub': user_info.get('sub'),
+                'email': user_info.get('email'),
+                'email_verified': user_info.get('email_verified', False),
+                'name': user_info.get('name'),
+                'picture': user_info.get('picture'),
+                'given_name': user_info.get('given_name'),
+                'family_name': user_info.get('family_name'),
+                'iss': 'https://accounts.google.com',
+                'aud': settings.GOOGLE_CLIENT_ID,
+            }
 
-                if token_info_response.status_code == 200:
-                    token_info = token_info_response.json()
-                    print(f"✅ Access token info: {token_info}")
-
-                    # Проверяем, что токен действителен и для нашего client_id
-                    if token_info.get('audience') != settings.GOOGLE_CLIENT_ID:
-                        raise ValueError("Token audience does not match our client ID")
-
-                    # Получаем информацию о пользователе
-                    user_info_response = await client.get(
-                        "https://www.googleapis.com/oauth2/v3/userinfo",
-                        headers={"Authorization": f"Bearer {access_token}"}
-                    )
-
-                    if user_info_response.status_code == 200:
-                        user_info = user_info_response.json()
-                        print(f"✅ User info: {user_info}")
-
-                        # Форматируем в тот же формат, что и ID token
-                        return {
-                            'sub': user_info.get('sub'),
-                            'email': user_info.get('email'),
-                            'email_verified': user_info.get('email_verified', False),
-                            'name': user_info.get('name'),
-                            'picture': user_info.get('picture'),
-                            'given_name': user_info.get('given_name'),
-                            'family_name': user_info.get('family_name'),
-                            'iss': 'https://accounts.google.com',
-                            'aud': settings.GOOGLE_CLIENT_ID,
-                        }
-                    else:
-                        raise ValueError("Failed to get user info")
-                else:
-                    error_detail = token_info_response.json()
-                    raise ValueError(f"Invalid access token: {error_detail.get('error_description', 'Unknown error')}")
+            expires_in = token_info.get('expires_in')
+            google_claims_cache.set(
+                access_token, claims, time.time() + int(expires_in) if expires_in is not None else None
+            )
+            return claims
 
         except Exception as e:
             print(f"❌ Access token verification failed: {str(e)}")
-            raise ValueError(f"Invalid access token: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Invalid access token: {str(e)}")
@@ -0,0 +1,309 @@
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Deque, List, Optional
+
+from sqlalchemy import select, update, exists, or_, bindparam, func, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.core.config import settings
+from app.database.database import engine
+from app.database.models import User, Role
+from app.database.models.associations import user_roles
+from app.services.mail_queue import OutboundEmail
+from app.services.resend_email_service import email_service
+
+# Срок действия токена приглашения (см. RegistrationService.set_password)
+VERIFICATION_TOKEN_HOURS = 24
+
+# Сколько завершенных кампаний хранить для просмотра
+CAMPAIGN_HISTORY_SIZE = 20
+
+# Сколько адресов с ошибкой отправки показывать в прогрессе
+FAILED_EMAILS_LIMIT = 100
+
+
+class InviteCampaignConflict(Exception):
+    """Другая кампания уже выполняется или кампания не в нужном состоянии"""
+
+
+class InviteCampaign:
+    """Рассылка приглашений (ссылок на установку пароля) выбранным пользователям"""
+
+    def __init__(self, role: Optional[str], groups: Optional[List[str]], include_recent: bool):
+        self.id = uuid.uuid4().hex
+        self.role = role
+        self.groups = groups
+        self.include_recent = include_recent
+        self.status = "pending"  # pending, running, paused, completed, failed, cancelled
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+
+        self.total = 0
+        self.enqueued = 0
+        self.skipped = 0  # зарегистрировались сами после выборки
+        self.sent = 0
+        self.failed = 0
+        self.failed_emails: List[str] = []
+
+        # id пользователей без токена и выданные, но еще не поставленные в очередь письма
+        self.pending_ids: Deque[int] = deque()
+        self.issued: Deque[dict] = deque()
+
+        self.pause_event = threading.Event()
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("pending", "running", "paused")
+
+    def on_delivery(self, item: OutboundEmail, success: bool):
+        """Результат отправки из потока очереди писем"""
+        with self._lock:
+            if success:
+                self.sent += 1
+            else:
+                self.failed += 1
+                if len(self.failed_emails) < FAILED_EMAILS_LIMIT:
+                    self.failed_emails.append(item.email)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "role": self.role,
+            "groups": self.groups,
+            "include_recent": self.include_recent,
+            "status": self.status,
+            "error": self.error,
+            "total": self.total,
+            "remaining": len(self.pending_ids) + len(self.issued),
+            "enqueued": self.enqueued,
+            "skipped": self.skipped,
+            "sent": self.sent,
+            "failed": self.failed,
+            "in_flight": self.enqueued - self.sent - self.failed,
+            "failed_emails": list(self.failed_emails),
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class InviteCampaignManager:
+    """
+    Массовая рассылка приглашений пользователям с requires_password (по роли и/или классам)
+    Письмо ведет на установку пароля (/auth/set-password): аккаунт активируется только
+    после того, как пользователь задаст свой пароль, verify-email такой токен не примет
+    - токены приглашения выдаются пакетами по INVITE_BATCH_SIZE: один UPDATE ... FROM unnest(ids, tokens)
+      непосредственно перед отправкой пакета, чтобы токены не истекали в длинной кампании
+    - письма ставятся в общую очередь (одно SMTP-соединение) не быстрее INVITE_RATE_PER_MINUTE
+    - кампанию можно приостановить и продолжить; после перезапуска процесса та же выборка
+      без include_recent пропускает уже приглашенных (токен еще действует)
+    - одновременно выполняется одна кампания
+    """
+
+    def __init__(self, history_size: int = CAMPAIGN_HISTORY_SIZE):
+        self._history_size = history_size
+        self._campaigns: "OrderedDict[str, InviteCampaign]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, role: Optional[str] = None, groups: Optional[List[str]] = None,
+              include_recent: bool = False) -> InviteCampaign:
+        if not role and not groups:
+            raise ValueError("Укажите роль или классы для рассылки")
+
+        with self._lock:
+            active = self._active_campaign()
+            if active:
+                raise InviteCampaignConflict(f"Рассылка {active.id} еще не завершена ({active.status})")
+
+            campaign = InviteCampaign(role, groups, include_recent)
+            self._campaigns[campaign.id] = campaign
+            while len(self._campaigns) > self._history_size:
+                oldest_id = next(iter(self._campaigns))
+                if self._campaigns[oldest_id].is_active:
+                    break
+                self._campaigns.pop(oldest_id)
+
+        try:
+            campaign.pending_ids.extend(self._select_user_ids(campaign))
+        except Exception as e:
+            campaign.error = str(e)
+            self._finish(campaign, "failed")
+            raise
+        campaign.total = len(campaign.pending_ids)
+        print(f"📨 Рассылка приглашений {campaign.id}: {campaign.total} пользователей")
+
+        self._spawn(campaign)
+        return campaign
+
+    def get(self, campaign_id: str) -> Optional[InviteCampaign]:
+        return self._campaigns.get(campaign_id)
+
+    def list(self) -> List[InviteCampaign]:
+        return list(reversed(self._campaigns.values()))
+
+    def pause(self, campaign_id: str) -> Optional[InviteCampaign]:
+        """Остановка постановки писем в очередь; уже поставленные письма отправляются"""
+        campaign = self._campaigns.get(campaign_id)
+        if campaign and campaign.status in ("pending", "running"):
+            campaign.pause_event.set()
+        return campaign
+
+    def resume(self, campaign_id: str) -> Optional[InviteCampaign]:
+        campaign = self._campaigns.get(campaign_id)
+        if campaign is None:
+            return None
+
+        with self._lock:
+            if campaign.status != "paused":
+                raise InviteCampaignConflict(f"Рассылка не приостановлена ({campaign.status})")
+            campaign.pause_event.clear()
+            campaign.status = "pending"
+
+        self._spawn(campaign)
+        return campaign
+
+    def cancel(self, campaign_id: str) -> Optional[InviteCampaign]:
+        campaign = self._campaigns.get(campaign_id)
+        if campaign and campaign.is_active:
+            campaign.cancel_event.set()
+            if campaign.status == "paused":
+                self._finish(campaign, "cancelled")
+        return campaign
+
+    def _active_campaign(self) -> Optional[InviteCampaign]:
+        return next((campaign for campaign in self._campaigns.values() if campaign.is_active), None)
+
+    def _spawn(self, campaign: InviteCampaign):
+        thread = threading.Thread(target=self._run, args=(campaign,), name=f"invite-{campaign.id[:8]}", daemon=True)
+        thread.start()
+
+    @staticmethod
+    def _select_user_ids(campaign: InviteCampaign) -> List[int]:
+        """id пользователей, которым нужно приглашение"""
+        query = select(User.id).where(
+            User.requires_password == True,
+            User.archived == False,
+            User.is_verified.isnot(True),
+        )
+        if campaign.role:
+            query = query.where(exists().where(
+                user_roles.c.user_id == User.id,
+                user_roles.c.role_id == Role.id,
+                Role.name == campaign.role
+            ))
+        if campaign.groups:
+            query = query.where(User.group_name.in_(campaign.groups))
+        if not campaign.include_recent:
+            # Приглашенные с еще действующим токеном (в том числе прерванной кампанией)
+            valid_since = datetime.utcnow() - timedelta(hours=VERIFICATION_TOKEN_HOURS)
+            query = query.where(or_(
+                User.verification_sent_at.is_(None),
+                User.verification_sent_at < valid_since
+            ))
+
+        with engine.connect() as connection:
+            return list(connection.execute(query.order_by(User.id)).scalars())
+
+    @staticmethod
+    def _issue_tokens(user_ids: List[int]) -> List[dict]:
+        """
+        Новые токены приглашения для пакета пользователей одним UPDATE
+        Пары (id, токен) передаются массивами и разворачиваются через unnest;
+        зарегистрировавшиеся с момента выборки пропускаются
+        """
+        tokens = [email_service.generate_verification_token() for _ in user_ids]
+        incoming = func.unnest(
+            bindparam("user_ids", user_ids, type_=ARRAY(Integer)),
+            bindparam("tokens", tokens, type_=ARRAY(String))
+        ).table_valued("id", "token").render_derived(name="incoming")
+
+        users = User.__table__
+        stmt = update(users).where(
+            users.c.id == incoming.c.id,
+            users.c.requires_password == True,
+            users.c.is_verified.isnot(True),
+        ).values(
+            verification_token=incoming.c.token,
+            verification_sent_at=datetime.utcnow()
+        ).returning(users.c.id, users.c.email, users.c.display_name, users.c.verification_token)
+
+        with engine.begin() as connection:
+            rows = [dict(row._mapping) for row in connection.execute(stmt)]
+
+        # Порядок выборки, а не порядок RETURNING
+        order = {user_id: index for index, user_id in enumerate(user_ids)}
+        return sorted(rows, key=lambda row: order[row["id"]])
+
+    def _run(self, campaign: InviteCampaign):
+        campaign.status = "running"
+        interval = 60.0 / settings.INVITE_RATE_PER_MINUTE if settings.INVITE_RATE_PER_MINUTE > 0 else 0.0
+        next_send = time.monotonic()
+
+        try:
+            while not campaign.cancel_event.is_set():
+                if campaign.pause_event.is_set():
+                    campaign.status = "paused"
+                    print(f"⏸️  Рассылка приглашений {campaign.id} приостановлена")
+                    return
+
+                if not campaign.issued:
+                    if not campaign.pending_ids:
+                        break
+                    batch = list(itertools.islice(campaign.pending_ids, settings.INVITE_BATCH_SIZE))
+                    rows = self._issue_tokens(batch)
+                    for _ in batch:
+                        campaign.pending_ids.popleft()
+                    campaign.skipped += len(batch) - len(rows)
+                    campaign.issued.extend(rows)
+                    continue
+
+                # Обратное давление: не забегаем далеко вперед очереди писем
+                if email_service.queue.stats()["queued"] >= settings.INVITE_BATCH_SIZE:
+                    campaign.cancel_event.wait(1.0)
+                    continue
+
+                # Ограничение скорости
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    campaign.cancel_event.wait(delay)
+                    continue
+
+                row = campaign.issued[0]
+                if not email_service.send_invite_email(
+                        email=row["email"],
+                        invite_token=row["verification_token"],
+                        user_name=row["display_name"],
+                        on_done=campaign.on_delivery
+                ):
+                    # Очередь переполнена - повторяем это же письмо позже
+                    next_send = time.monotonic() + 1.0
+                    continue
+
+                campaign.issued.popleft()
+                campaign.enqueued += 1
+                next_send = time.monotonic() + interval
+
+            self._finish(campaign, "cancelled" if campaign.cancel_event.is_set() else "completed")
+
+        except Exception as e:
+            campaign.error = str(e)
+            self._finish(campaign, "failed")
+            print(f"❌ Ошибка рассылки приглашений {campaign.id}: {e}")
+
+    @staticmethod
+    def _finish(campaign: InviteCampaign, status: str):
+        campaign.status = status
+        campaign.finished_at = datetime.now()
+        print(
+            f"📨 Рассылка приглашений {campaign.id}: {status}, "
+            f"в очереди {campaign.enqueued}, отправлено {campaign.sent}, ошибок {campaign.failed}"
+        )
+
+
+invite_campaign_manager = InviteCampaignManager()
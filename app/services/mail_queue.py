@@ -0,0 +1,235 @@
+import heapq
+import itertools
+import os
+import queue
+import smtplib
+import threading
+import time
+from dataclasses import dataclass, field
+from email.message import Message
+from typing import Callable, List, Optional
+
+from app.core.config import settings
+
+
+@dataclass
+class OutboundEmail:
+    """Письмо в очереди отправки"""
+    email: str
+    subject: str
+    template_name: str
+    message: Message
+    attempts: int = 0
+    last_error: Optional[str] = None
+    # Вызывается после окончательного результата: (письмо, отправлено ли)
+    on_done: Optional[Callable[["OutboundEmail", bool], None]] = field(default=None, repr=False)
+
+
+class MailQueue:
+    """
+    Очередь исходящих писем внутри процесса
+    - обработчики запросов только ставят письмо в очередь
+    - фоновый поток держит одно авторизованное SMTP-соединение и отправляет письма пакетами
+    - соединение переоткрывается после MAIL_MAX_PER_CONNECTION писем и закрывается после простоя
+    - временные ошибки повторяются с экспоненциальной задержкой, отказ получателя - сразу failed
+    """
+
+    # Простой соединения, после которого перед пакетом проверяем его NOOP
+    NOOP_AFTER_IDLE_SECONDS = 5
+
+    def __init__(self, connect: Callable[[], smtplib.SMTP], on_result: Callable[[List[OutboundEmail], bool], None]):
+        self._connect = connect
+        self._on_result = on_result
+        self._queue: "queue.Queue[OutboundEmail]" = queue.Queue(maxsize=settings.MAIL_QUEUE_MAX_SIZE)
+        self._retries: list = []  # куча (время повтора, порядковый номер, письмо)
+        self._sequence = itertools.count()
+        self._connection: Optional[smtplib.SMTP] = None
+        self._sent_on_connection = 0
+        self._last_used = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.sent = 0
+        self.failed = 0
+
+    def enqueue(self, item: OutboundEmail) -> bool:
+        """Постановка письма в очередь; False, если очередь переполнена"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            print(f"❌ Очередь писем переполнена, письмо не поставлено: {item.email}")
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "retrying": len(self._retries),
+            "sent": self.sent,
+            "failed": self.failed,
+            "connected": self._connection is not None,
+        }
+
+    def stop(self, timeout: float = 10.0):
+        """Дождаться отправки очереди (при остановке приложения) и закрыть соединение"""
+        deadline = time.monotonic() + timeout
+        while (self._queue.qsize() or self._retries) and time.monotonic() < deadline:
+            time.sleep(0.2)
+        self._stopping.set()
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopping.clear()
+                    self._thread = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if not batch:
+                self._close_if_idle()
+                continue
+
+            try:
+                self._send_batch(batch)
+            except Exception as e:
+                # Ошибка вне отправки конкретного письма не должна останавливать поток
+                print(f"❌ Ошибка очереди писем: {e}")
+
+        self._close_connection()
+
+    def _next_batch(self) -> List[OutboundEmail]:
+        """Пакет до MAIL_QUEUE_BATCH_SIZE писем: сначала подошедшие повторы, затем новые"""
+        batch = []
+        now = time.monotonic()
+        while self._retries and self._retries[0][0] <= now and len(batch) < settings.MAIL_QUEUE_BATCH_SIZE:
+            batch.append(heapq.heappop(self._retries)[2])
+
+        timeout = 1.0
+        if self._retries:
+            timeout = min(timeout, max(self._retries[0][0] - now, 0.0))
+
+        try:
+            if not batch:
+                batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < settings.MAIL_QUEUE_BATCH_SIZE:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        return batch
+
+    def _send_batch(self, batch: List[OutboundEmail]):
+        sent, failed = [], []
+        self._check_idle_connection()
+
+        for item in batch:
+            try:
+                self._send(item)
+                self._sent_on_connection += 1
+                self._last_used = time.monotonic()
+                sent.append(item)
+                print(f"✅ Письмо {item.template_name} отправлено: {item.email}")
+
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as e:
+                # Постоянная ошибка адреса - повтор не поможет
+                item.last_error = str(e)
+                failed.append(item)
+
+            except (smtplib.SMTPException, OSError) as e:
+                item.last_error = str(e)
+                self._close_connection()
+                if not self._schedule_retry(item):
+                    failed.append(item)
+
+        for item in failed:
+            print(f"❌ Не удалось отправить письмо {item.template_name} на {item.email}: {item.last_error}")
+
+        self.sent += len(sent)
+        self.failed += len(failed)
+        if sent:
+            self._finish(sent, True)
+        if failed:
+            self._finish(failed, False)
+
+    def _finish(self, items: List[OutboundEmail], success: bool):
+        try:
+            self._on_result(items, success)
+        except Exception as e:
+            print(f"❌ Ошибка обработки результата отправки: {e}")
+
+        for item in items:
+            if item.on_done:
+                try:
+                    item.on_done(item, success)
+                except Exception as e:
+                    print(f"❌ Ошибка обработки результата отправки: {e}")
+
+    def _schedule_retry(self, item: OutboundEmail) -> bool:
+        item.attempts += 1
+        if item.attempts >= settings.MAIL_MAX_ATTEMPTS:
+            return False
+
+        delay = settings.MAIL_RETRY_BACKOFF_SECONDS * 2 ** (item.attempts - 1)
+        heapq.heappush(self._retries, (time.monotonic() + delay, next(self._sequence), item))
+        print(f"🔁 Повтор письма на {item.email} через {delay} сек.: {item.last_error}")
+        return True
+
+    def _send(self, item: OutboundEmail):
+        try:
+            self._get_connection().send_message(item.message)
+        except smtplib.SMTPServerDisconnected:
+            # Сервер закрыл соединение между письмами - переподключаемся и повторяем сразу
+            self._close_connection()
+            self._get_connection().send_message(item.message)
+
+    def _check_idle_connection(self):
+        """
+        NOOP один раз перед пакетом и только после простоя: внутри пакета соединение
+        не проверяется, разрыв обрабатывается переподключением в _send
+        """
+        if self._connection is None or time.monotonic() - self._last_used < self.NOOP_AFTER_IDLE_SECONDS:
+            return
+        try:
+            if self._connection.noop()[0] != 250:
+                self._close_connection()
+        except (smtplib.SMTPException, OSError):
+            self._close_connection()
+
+    def _get_connection(self) -> smtplib.SMTP:
+        if self._connection is not None and self._sent_on_connection >= settings.MAIL_MAX_PER_CONNECTION:
+            self._close_connection()
+
+        if self._connection is None:
+            self._connection = self._connect()
+            self._sent_on_connection = 0
+
+        return self._connection
+
+    def _close_if_idle(self):
+        if self._connection is not None and time.monotonic() - self._last_used > settings.MAIL_CONNECTION_IDLE_SECONDS:
+            self._close_connection()
+
+    def _close_connection(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.quit()
+            except (smtplib.SMTPException, OSError):
+                connection.close()
+
+    def reset(self):
+        """Сброс в дочернем процессе после fork: поток и соединение родителя не наследуются"""
+        self._queue = queue.Queue(maxsize=settings.MAIL_QUEUE_MAX_SIZE)
+        self._retries = []
+        self._connection = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+
+def register_fork_reset(mail_queue: MailQueue):
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=mail_queue.reset)
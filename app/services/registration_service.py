@@ -2,7 +2,7 @@ from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from app.database.models.users import User
 from app.database.models.roles import Role
-from app.auth.utils import get_password_hash, verify_password
+from app.auth.utils import get_password_hash
 from app.services.resend_email_service import email_service
 
 class RegistrationService:
@@ -20,7 +20,7 @@ class RegistrationService:
         ).first()
 
 
-        if existing_user and not existing_user.requires_password:
+        if existing_user and not existing_user.requires_password and existing_user.is_verified:
             raise ValueError("Пользователь с таким email уже существует")
         if not existing_user:
             raise ValueError("Пользователь с таким email не найден в базе данных школы")
@@ -29,24 +29,25 @@ class RegistrationService:
         # Генерируем токен верификации
         verification_token = email_service.generate_verification_token()
 
-        existing_user.password_hash=get_password_hash(password),
-        existing_user.verification_token=verification_token,
-        existing_user.verification_sent_at=datetime.utcnow(),
+        existing_user.password_hash = get_password_hash(password)
+        # Пароль задан самим пользователем - осталось подтвердить email
+        existing_user.requires_password = False
+        existing_user.verification_token = verification_token
+        existing_user.verification_sent_at = datetime.utcnow()
         db.commit()
         db.refresh(existing_user)
 
         # Отправляем email подтверждения
         email_sent = email_service.send_verification_email(
-            db=db,
             email=email,
             verification_token=verification_token,
             user_name=existing_user.display_name
         )
 
         if not email_sent:
-            print(f"⚠️ Не удалось отправить email подтверждения для {email}")
+            print(f"⚠️ Не удалось поставить в очередь email подтверждения для {email}")
         else:
-            print(f"📧 Email подтверждения отправлен на: {email}")
+            print(f"📧 Email подтверждения поставлен в очередь: {email}")
 
         return existing_user
 
@@ -61,6 +62,10 @@ class RegistrationService:
         if not user:
             raise ValueError("Неверный или устаревший токен подтверждения")
 
+        # Токен приглашения: пароль еще не задан (у синхронизированных учеников - общий временный)
+        if user.requires_password:
+            raise ValueError("Сначала задайте пароль по ссылке из приглашения")
+
         # Проверяем не истек ли токен (24 часа)
         token_expiration = user.verification_sent_at + timedelta(hours=24)
         if datetime.utcnow() > token_expiration:
@@ -69,14 +74,12 @@ class RegistrationService:
         # Активируем пользователя
         user.is_active = True
         user.is_verified = True
-        user.requires_password = False
         user.email_verified_at = datetime.utcnow()
         user.verification_token = None  # Удаляем использованный токен
         db.commit()
         db.refresh(user)
 
         email_service.send_welcome_email(
-            db,
             email=user.email,
             user_name=user.display_name
         )
@@ -84,6 +87,47 @@ class RegistrationService:
         print(f"✅ Email подтвержден для: {user.email}")
         return user
 
+    @staticmethod
+    def get_invited_user(db: Session, invite_token: str) -> User:
+        """Пользователь по токену приглашения (массовая рассылка), еще не задавший пароль"""
+        user = db.query(User).filter(
+            User.verification_token == invite_token,
+            User.requires_password == True,
+            User.is_verified.isnot(True)
+        ).first()
+
+        if not user:
+            raise ValueError("Неверная или устаревшая ссылка приглашения")
+
+        token_expiration = user.verification_sent_at + timedelta(hours=24)
+        if datetime.utcnow() > token_expiration:
+            raise ValueError("Срок действия ссылки приглашения истек")
+
+        return user
+
+    @staticmethod
+    def complete_invite(db: Session, user: User, password_hash: str) -> User:
+        """
+        Установка пароля по приглашению: email подтвержден переходом по ссылке,
+        аккаунт активируется только вместе с собственным паролем пользователя
+        """
+        user.password_hash = password_hash
+        user.requires_password = False
+        user.is_active = True
+        user.is_verified = True
+        user.email_verified_at = datetime.utcnow()
+        user.verification_token = None
+        db.commit()
+        db.refresh(user)
+
+        email_service.send_welcome_email(
+            email=user.email,
+            user_name=user.display_name
+        )
+
+        print(f"✅ Пароль задан по приглашению: {user.email}")
+        return user
+
     @staticmethod
     def resend_verification_email(db: Session, email: str) -> bool:
         """Повторная отправка email подтверждения"""
@@ -104,7 +148,6 @@ class RegistrationService:
 
         # Отправляем email
         success = email_service.send_verification_email(
-            db,
             email=email,
             verification_token=new_token,
             user_name=user.display_name
@@ -0,0 +1,108 @@
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from pydantic import BaseModel
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.models import User
+from app.services.event_type_service.catalog_cache import LocalVersionBackend, RedisVersionBackend
+
+
+class GroupRosterStats(BaseModel):
+    group_name: str
+    active_count: int = 0
+    archived_count: int = 0
+    class_teacher: Optional[str] = None
+
+
+class RosterStatsService:
+    """
+    Статистика состава классов (активные, архивные ученики, классный руководитель)
+    Кэш каждого воркера сбрасывается по общей версии (Redis INCR при синхронизации в любом воркере)
+    и в любом случае живет не дольше ROSTER_STATS_TTL_SECONDS
+    """
+
+    def __init__(self, backend, ttl_seconds: int):
+        self._backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._version: Optional[int] = None
+        # group_name -> (время загрузки, статистика)
+        self._cache: Dict[str, Tuple[float, GroupRosterStats]] = {}
+        self._lock = threading.Lock()
+
+    def get_stats(self, db: Session, group_names: Iterable[str]) -> Dict[str, GroupRosterStats]:
+        """Статистика по списку классов; недостающие и устаревшие считаются одним пакетом"""
+        group_names = set(group_names)
+        version = self._backend.get_version()
+        valid_since = time.monotonic() - self.ttl_seconds
+
+        with self._lock:
+            if version != self._version:
+                self._cache.clear()
+                self._version = version
+            result = {
+                name: self._cache[name][1]
+                for name in group_names
+                if name in self._cache and self._cache[name][0] >= valid_since
+            }
+
+        missing = group_names - result.keys()
+        if missing:
+            loaded_at = time.monotonic()
+            loaded = self._load(db, missing)
+            with self._lock:
+                # Не сохраняем, если статистику сбросили во время загрузки
+                if self._version == version:
+                    self._cache.update({name: (loaded_at, stats) for name, stats in loaded.items()})
+            result.update(loaded)
+
+        return result
+
+    def invalidate(self):
+        """Сброс кэша во всех воркерах (вызывается после синхронизации)"""
+        self._backend.bump()
+        with self._lock:
+            self._cache.clear()
+            self._version = None
+
+    def _load(self, db: Session, group_names: set) -> Dict[str, GroupRosterStats]:
+        stats = {name: GroupRosterStats(group_name=name) for name in group_names}
+
+        # Один сгруппированный COUNT по всем классам
+        counts = db.query(
+            User.group_name,
+            func.count().filter(User.archived == False),
+            func.count().filter(User.archived == True),
+        ).filter(
+            User.group_name.in_(group_names)
+        ).group_by(User.group_name).all()
+
+        for group_name, active_count, archived_count in counts:
+            stats[group_name].active_count = active_count
+            stats[group_name].archived_count = archived_count
+
+        # Классные руководители: учителей немного, разбираем groups_leader в памяти
+        # Пустое значение в JSONB-колонке хранится как JSON null, а не SQL NULL - берем только массивы
+        leaders = db.query(User.display_name, User.groups_leader).filter(
+            func.jsonb_typeof(User.groups_leader) == 'array',
+            User.archived == False,
+        ).all()
+
+        for display_name, groups_leader in leaders:
+            for group_name in groups_leader:
+                if group_name in stats and stats[group_name].class_teacher is None:
+                    stats[group_name].class_teacher = display_name
+
+        return stats
+
+
+def _create_backend():
+    if settings.ROSTER_STATS_REDIS_URL:
+        return RedisVersionBackend(settings.ROSTER_STATS_REDIS_URL, key="markbook:roster_stats_version")
+    return LocalVersionBackend()
+
+
+roster_stats_service = RosterStatsService(_create_backend(), ttl_seconds=settings.ROSTER_STATS_TTL_SECONDS)
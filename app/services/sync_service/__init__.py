@@ -1,3 +1,12 @@
 from .teacher_sync_service import TeacherSyncService
 from .student_sync_service import StudentSyncService
-__all__ = ["TeacherSyncService", "StudentSyncService"]
\ No newline at end of file
+from .unified_sync_service import UnifiedSyncService
+from .sync_jobs import sync_job_manager, sync_scheduler, SyncJobConflict
+__all__ = [
+    "TeacherSyncService",
+    "StudentSyncService",
+    "UnifiedSyncService",
+    "sync_job_manager",
+    "sync_scheduler",
+    "SyncJobConflict"
+]
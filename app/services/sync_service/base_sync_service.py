@@ -1,166 +1,535 @@
-from typing import List, TypeVar, Generic
+import hashlib
+import queue
+import threading
+from typing import List, TypeVar, Generic, Dict, Optional, Sequence, Iterable, Iterator
+from sqlalchemy import select, update, exists, and_, any_, bindparam, func, String
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime
+from app.auth.principal_cache import principal_cache
 from app.database.models import User, Role
+from app.database.models.associations import user_roles
 
-from app.services.sync_service.schemas.sync_schemas import SyncStats
+from app.services.sync_service.schemas.sync_schemas import SyncStats, SyncPlan, SyncPlanEntry, FieldChange
+from app.services.roster_stats_service import roster_stats_service
 
 T = TypeVar('T')
 
 
+class SyncCancelled(Exception):
+    """Синхронизация остановлена по запросу"""
+
+
+# Ошибки, прерывающие синхронизацию целиком (в отличие от ошибок отдельных записей)
+CRITICAL_ERROR_PREFIX = "Критическая ошибка"
+CANCELLED_ERROR = "Синхронизация остановлена"
+
+
+def is_aborting_error(error: str) -> bool:
+    return error.startswith(CRITICAL_ERROR_PREFIX) or error == CANCELLED_ERROR
+
+
+# Сколько прочитанных пакетов может ждать записи
+PREFETCH_DEPTH = 2
+
+
+def prefetch(iterable: Iterable[T], depth: int = PREFETCH_DEPTH) -> Iterator[T]:
+    """
+    Итерация с упреждающим чтением в отдельном потоке через ограниченную очередь
+    Исключение источника пробрасывается потребителю; при досрочном выходе источник закрывается
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(message) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(message, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader():
+        try:
+            for item in iterable:
+                if not put(('item', item)):
+                    return
+            put(('end', None))
+        except BaseException as e:
+            put(('error', e))
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close:
+                close()
+
+    thread = threading.Thread(target=reader, name="sync-prefetch", daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            kind, value = buffer.get()
+            if kind == 'end':
+                return
+            if kind == 'error':
+                raise value
+            yield value
+    finally:
+        stopped.set()
+        thread.join()
+
+
 class BaseSyncService(Generic[T]):
     """Базовый класс для сервисов синхронизации"""
 
+    # Размер пакета INSERT ... ON CONFLICT (один commit на пакет)
+    CHUNK_SIZE = 500
+
+    # Колонки users, которыми управляет конкретная синхронизация (помимо общих)
+    specific_columns: tuple = ()
+
     def __init__(self, role_name: str):
         self.role_name = role_name
 
-    def sync(self, db: Session, external_data: List[T]) -> SyncStats:
-        """Базовый метод синхронизации"""
-        stats = SyncStats(total_external=len(external_data))
+    def sync(self, db: Session, external_data: List[T], archive_missing: bool = True,
+             stats: Optional[SyncStats] = None, cancel_event: Optional[threading.Event] = None) -> SyncStats:
+        """
+        Базовый метод синхронизации
+        archive_missing=False - инкрементальный режим: во входных данных только изменившиеся записи
+        """
+        return self.sync_chunks(db, [external_data], archive_missing, stats, cancel_event)
+
+    def sync_chunks(self, db: Session, chunks: Iterable[List[T]], archive_missing: bool = True,
+                    stats: Optional[SyncStats] = None, cancel_event: Optional[threading.Event] = None) -> SyncStats:
+        """
+        Синхронизация потока пакетов (например, потокового чтения внешней БД)
+        Следующий пакет читается в фоновом потоке, пока текущий записывается в БД
+        При ошибке чтения или остановке архивация не выполняется - данные источника неполные
+        stats - объект прогресса, который читают снаружи (фоновые задачи)
+        cancel_event - остановка между пакетами; записанные пакеты сохраняются
+        """
+        stats = stats if stats is not None else SyncStats()
+        # Общий объект статистики может копить несколько синхронизаций - в лог выводим только эту
+        baseline = stats.model_copy(deep=True)
 
         try:
             role = self._get_role(db)
             if not role:
-                stats.errors.append(f"Роль '{self.role_name}' не найдена")
+                stats.errors.append(f"{CRITICAL_ERROR_PREFIX}: роль '{self.role_name}' не найдена")
                 return stats
 
-            external_ids = [item.uid for item in external_data]
+            external_ids = []
+
+            for external_chunk in prefetch(chunks):
+                stats.total_external += len(external_chunk)
+                chunk_ids = [item.uid for item in external_chunk]
+                external_ids.extend(chunk_ids)
 
-            # Синхронизация данных
-            for item in external_data:
-                self._process_single_item(db, item, role, stats)
+                # Снимок существующих пользователей пакета одним запросом
+                snapshot = self._load_snapshot(db, role, chunk_ids)
+
+                # Синхронизация данных пакетами
+                for start in range(0, len(external_chunk), self.CHUNK_SIZE):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise SyncCancelled()
+
+                    chunk = external_chunk[start:start + self.CHUNK_SIZE]
+                    self._sync_chunk(db, chunk, snapshot, role, stats)
+                    stats.processed += len(chunk)
 
             # Архивирование отсутствующих
-            stats.archived = self._archive_missing(db, external_ids)
+            if archive_missing:
+                stats.archived += self._archive_missing(db, role, external_ids)
 
             db.commit()
-            self._print_stats(stats)
+            roster_stats_service.invalidate()
+            self._print_stats(stats, baseline)
+
+        except SyncCancelled:
+            db.rollback()
+            stats.errors.append(CANCELLED_ERROR)
+            print(f"⏹️  Синхронизация {self.role_name} остановлена")
 
         except Exception as e:
             db.rollback()
-            stats.errors.append(f"Критическая ошибка: {str(e)}")
+            stats.errors.append(f"{CRITICAL_ERROR_PREFIX}: {str(e)}")
 
         return stats
 
+    def plan(self, db: Session, external_data: List[T], archive_missing: bool = True) -> SyncPlan:
+        """Изменения синхронизации без записи (dry-run)"""
+        return self.plan_chunks(db, [external_data], archive_missing)
+
+    def plan_chunks(self, db: Session, chunks: Iterable[List[T]], archive_missing: bool = True) -> SyncPlan:
+        """
+        Dry-run: те же снимок и сравнение в памяти, что и при синхронизации, но без записи
+        Возвращает добавляемых, обновляемых (с изменениями по полям) и архивируемых пользователей
+        """
+        plan = SyncPlan(role=self.role_name)
+        role = self._get_role(db)
+        if not role:
+            plan.errors.append(f"Роль '{self.role_name}' не найдена")
+            return plan
+
+        external_ids = []
+        planned_ids = set()
+
+        for external_chunk in prefetch(chunks):
+            chunk_ids = [item.uid for item in external_chunk]
+            external_ids.extend(chunk_ids)
+            snapshot = self._load_snapshot(db, role, chunk_ids)
+
+            for item in external_chunk:
+                if item.uid in planned_ids:
+                    continue
+                planned_ids.add(item.uid)
+
+                try:
+                    self._plan_item(plan, snapshot.get(item.uid), item)
+                except Exception as e:
+                    plan.errors.append(f"{item.display_name}: {str(e)}")
+
+        if archive_missing:
+            query = select(User.external_id, User.display_name, User.email).where(
+                self._missing_condition(role, external_ids)
+            )
+            plan.to_archive = [
+                SyncPlanEntry(action='archive', external_id=external_id, display_name=display_name, email=email)
+                for external_id, display_name, email in db.execute(query)
+            ]
+
+        return plan
+
+    def _plan_item(self, plan: SyncPlan, row: Optional[dict], item: T):
+        if row is None:
+            plan.to_add.append(SyncPlanEntry(
+                action='add',
+                external_id=item.uid,
+                display_name=item.display_name,
+                email=self._get_item_email(item)
+            ))
+            return
+
+        if self._is_unchanged(row, self._fingerprint(item)):
+            plan.unchanged += 1
+            return
+
+        changes = {
+            column: FieldChange(old=row[column], new=value)
+            for column, value in self._diff_item(row, item).items()
+        }
+        if not row['has_role']:
+            changes['role'] = FieldChange(old=None, new=self.role_name)
+
+        if not changes:
+            plan.unchanged += 1
+            return
+
+        plan.to_update.append(SyncPlanEntry(
+            action='update',
+            external_id=item.uid,
+            display_name=row['display_name'],
+            email=row['email'],
+            changes=changes
+        ))
+
     def _get_role(self, db: Session) -> Role:
         """Получение роли"""
         return db.query(Role).filter_by(name=self.role_name).first()
 
-    def _process_single_item(self, db: Session, item: T, role: Role, stats: SyncStats):
-        """Обработка одного элемента"""
-        try:
-            existing_user = db.query(User).filter(User.external_id == item.uid).first()
-
-            if existing_user:
-                if self._update_item(existing_user, item, role):
-                    stats.updated += 1
-                    print(f"🔄 Обновлен: {item.display_name}")
+    def _managed_columns(self) -> tuple:
+        """Колонки users, которые перезаписывает синхронизация"""
+        return ('email', 'display_name', 'archived', 'sync_fingerprint') + self.specific_columns
+
+    def _load_snapshot(self, db: Session, role: Role, external_ids: List[str]) -> Dict[str, dict]:
+        """
+        Пользователи с входящими external_id: external_id -> строка
+        Один запрос; список id передается одним параметром-массивом
+        """
+        has_role = exists().where(
+            user_roles.c.user_id == User.id,
+            user_roles.c.role_id == role.id
+        )
+        columns = [getattr(User, column) for column in ('id', 'external_id') + self._managed_columns()]
+        incoming_ids = bindparam("incoming_ids", external_ids, type_=ARRAY(String))
+        query = select(*columns, has_role.label('has_role')).where(
+            User.external_id == any_(incoming_ids)
+        )
+        return {row.external_id: dict(row._mapping) for row in db.execute(query)}
+
+    def _sync_chunk(self, db: Session, chunk: List[T], snapshot: Dict[str, dict], role: Role, stats: SyncStats):
+        """Расчет изменений пакета в памяти и запись пакетным upsert"""
+        new_rows = []
+        changed_rows = []
+        fingerprint_rows = []
+        chunk_uids = set()
+        now = datetime.now()
+
+        for item in chunk:
+            if item.uid in chunk_uids:
+                stats.errors.append(f"{item.display_name}: повтор uid {item.uid} в пакете, применена последняя запись")
+            chunk_uids.add(item.uid)
+
+            try:
+                fingerprint = self._fingerprint(item)
+                row = snapshot.get(item.uid)
+                if row is None:
+                    new_row = self._build_new_row(item, now)
+                    new_row['sync_fingerprint'] = fingerprint
+                    new_rows.append(new_row)
+                    # Повтор uid во входных данных обработается как обновление
+                    snapshot[item.uid] = {**new_row, 'has_role': True}
+                    continue
+
+                # Данные во внешней системе не менялись с прошлой синхронизации
+                if self._is_unchanged(row, fingerprint):
+                    stats.unchanged += 1
+                    continue
+
+                changes = self._diff_item(row, item)
+                row['sync_fingerprint'] = fingerprint
+                if not changes and row['has_role']:
+                    # Только запоминаем отпечаток, пользователь не изменился
+                    fingerprint_rows.append({'b_external_id': item.uid, 'b_fingerprint': fingerprint})
+                    stats.unchanged += 1
+                    continue
+
+                self._print_changes(item, row, changes)
+                row.update(changes)
+                changed_rows.append(self._build_update_row(row, now))
+
+            except Exception as e:
+                stats.errors.append(f"{item.display_name}: {str(e)}")
+                print(f"❌ Ошибка: {item.display_name} - {e}")
+
+        if fingerprint_rows:
+            self._store_fingerprints(db, fingerprint_rows)
+        new_rows, changed_rows = self._dedupe_rows(new_rows, changed_rows)
+        self._apply_rows(db, new_rows, changed_rows, snapshot, role, stats)
+
+    @staticmethod
+    def _dedupe_rows(new_rows: List[dict], changed_rows: List[dict]) -> tuple:
+        """
+        Одна строка на external_id: повтор uid в пакете дал бы две строки в одном
+        INSERT ... ON CONFLICT DO UPDATE (CardinalityViolation прерывает всю синхронизацию)
+        Остаются данные последней записи; новый пользователь остается новым (created_at, связь с ролью)
+        """
+        new_by_id = {row['external_id']: row for row in new_rows}
+        changed_by_id = {}
+        for row in changed_rows:
+            new_row = new_by_id.get(row['external_id'])
+            if new_row is not None:
+                new_row.update(row)
             else:
-                self._add_item(db, item, role)
-                stats.added += 1
-                db.commit()  # Коммитим каждую новую запись
-                print(f"✅ Добавлен: {item.display_name}")
-
-        except Exception as e:
-            stats.errors.append(f"{item.display_name}: {str(e)}")
-            print(f"❌ Ошибка: {item.display_name} - {e}")
-
-    def _update_item(self, user: User, item: T, role: Role) -> bool:
-        """Обновление существующего пользователя"""
-        has_changes = False
-
-        # Обновление email
-        if self._should_update_email(user, item):
-            user.email = self._get_item_email(item)
-            has_changes = True
-
-        # Обновление display_name
-        if item.display_name and user.display_name != item.display_name:
-            user.display_name = item.display_name
-            has_changes = True
-
-        # Обновление специфичных полей
-        has_changes |= self._update_specific_fields(user, item)
-
-        # Добавление роли если нужно
-        if role not in user.roles:
-            user.roles.append(role)
-            has_changes = True
-
-        # Восстановление из архива
-        if user.archived:
-            user.archived = False
-            has_changes = True
-
-            print(f"♻️  Восстановлен: {user.display_name}")
-
-        if has_changes:
-            user.updated_at = datetime.now()
+                changed_by_id[row['external_id']] = row
+        return list(new_by_id.values()), list(changed_by_id.values())
 
-
-        return has_changes
-
-    def _add_item(self, db: Session, item: T, role: Role):
-        """Добавление нового пользователя"""
+    def _build_new_row(self, item: T, now: datetime) -> dict:
+        """Строка users для нового пользователя"""
         email = self._get_item_email(item)
         if not email:
             raise ValueError("Отсутствует email")
 
-        user_data = {
+        row = {
             'external_id': item.uid,
             'email': email,
             'display_name': item.display_name,
-            'created_at': datetime.now(),
-            'updated_at': datetime.now(),
+            'created_at': now,
+            'updated_at': now,
             'archived': False
         }
 
         # Добавляем специфичные поля
-        user_data.update(self._get_specific_fields(item))
+        row.update(self._get_specific_fields(item))
+        return row
+
+    def _build_update_row(self, row: dict, now: datetime) -> dict:
+        """Строка для upsert существующего пользователя (все управляемые колонки)"""
+        update_row = {column: row[column] for column in ('external_id',) + self._managed_columns()}
+        update_row['updated_at'] = now
+        return update_row
+
+    def _diff_item(self, row: dict, item: T) -> dict:
+        """Изменения существующего пользователя: колонка -> новое значение"""
+        changes = {}
+
+        # Обновление email
+        if self._should_update_email(row, item):
+            changes['email'] = self._get_item_email(item)
+
+        # Обновление display_name
+        if item.display_name and row['display_name'] != item.display_name:
+            changes['display_name'] = item.display_name
 
-        user = User(**user_data)
-        user.roles.append(role)
-        db.add(user)
+        # Обновление специфичных полей
+        changes.update(self._diff_specific_fields(row, item))
 
-    def _archive_missing(self, db: Session, external_ids: List[str]) -> int:
-        """Архивация отсутствующих пользователей"""
+        # Восстановление из архива
+        if row['archived']:
+            changes['archived'] = False
+
+        return changes
+
+    def _is_unchanged(self, row: dict, fingerprint: Optional[str]) -> bool:
+        """Отпечаток совпадает с сохраненным, пользователь с ролью и не в архиве"""
+        return bool(fingerprint) and row['sync_fingerprint'] == fingerprint \
+            and row['has_role'] and not row['archived']
+
+    def _print_changes(self, item: T, row: dict, changes: dict):
+        if changes.get('archived') is False:
+            print(f"♻️  Восстановлен: {row['display_name']}")
+        details = [f"{column}: {row[column]} -> {value}" for column, value in changes.items() if column != 'archived']
+        if not row['has_role']:
+            details.append(f"роль {self.role_name}")
+        if details:
+            print(f"🔄 Обновлен: {item.display_name} ({'; '.join(details)})")
+
+    def _fingerprint(self, item: T) -> Optional[str]:
+        """sha256 значимых полей внешней записи; None - сравнение по отпечатку отключено"""
+        values = self._fingerprint_values(item)
+        if values is None:
+            return None
+        payload = "\x1f".join('' if value is None else str(value) for value in values)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _store_fingerprints(self, db: Session, fingerprint_rows: List[dict]):
+        """Пакетная запись отпечатков без изменения остальных полей"""
+        stmt = update(User.__table__).where(
+            User.__table__.c.external_id == bindparam('b_external_id')
+        ).values(sync_fingerprint=bindparam('b_fingerprint'))
         try:
-            missing_users = db.query(User).join(User.roles).filter(
-                Role.name == self.role_name,
-                User.archived == False,
-                ~User.external_id.in_(external_ids)
-            ).all()
+            db.execute(stmt, fingerprint_rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Ошибка сохранения отпечатков: {e}")
 
-            for user in missing_users:
-                user.archived = True
-                user.updated_at = datetime.now()
-                print(f"🚫 Архивирован: {user.display_name}")
+    def _apply_rows(self, db: Session, new_rows: List[dict], changed_rows: List[dict],
+                    snapshot: Dict[str, dict], role: Role, stats: SyncStats):
+        """Запись пакета; при конфликте (например, дубликат email) - построчно"""
+        if not new_rows and not changed_rows:
+            return
 
+        try:
+            self._upsert(db, new_rows, changed_rows, snapshot, role, stats)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            for row in new_rows:
+                self._apply_single_row(db, [row], [], snapshot, role, stats)
+            for row in changed_rows:
+                self._apply_single_row(db, [], [row], snapshot, role, stats)
+
+    def _apply_single_row(self, db: Session, new_rows: List[dict], changed_rows: List[dict],
+                          snapshot: Dict[str, dict], role: Role, stats: SyncStats):
+        row = (new_rows or changed_rows)[0]
+        try:
+            self._upsert(db, new_rows, changed_rows, snapshot, role, stats)
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            stats.errors.append(f"{row['display_name']}: {str(e.orig)}")
+            print(f"❌ Ошибка: {row['display_name']} - {e.orig}")
+
+    def _upsert(self, db: Session, new_rows: List[dict], changed_rows: List[dict],
+                snapshot: Dict[str, dict], role: Role, stats: SyncStats):
+        """INSERT ... ON CONFLICT (external_id) DO UPDATE + пакетная привязка ролей"""
+        update_columns = self._managed_columns() + ('updated_at',)
+        written = {}
+
+        for rows in (new_rows, changed_rows):
+            if not rows:
+                continue
+            stmt = pg_insert(User).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[User.external_id],
+                set_={column: stmt.excluded[column] for column in update_columns}
+            ).returning(User.id, User.external_id)
+            written.update({external_id: user_id for user_id, external_id in db.execute(stmt)})
+
+        # Роли: новым пользователям и существующим без роли
+        linked_ids = {row['external_id'] for row in new_rows}
+        linked_ids.update(row['external_id'] for row in changed_rows if not snapshot[row['external_id']]['has_role'])
+        role_links = [
+            {'user_id': written[external_id], 'role_id': role.id}
+            for external_id in linked_ids
+            if external_id in written
+        ]
+        if role_links:
+            db.execute(pg_insert(user_roles).values(role_links).on_conflict_do_nothing())
+
+        for row in new_rows:
+            print(f"✅ Добавлен: {row['display_name']} ({row['email']})")
+        stats.added += len(new_rows)
+        stats.updated += len(changed_rows)
+
+        # Core-запросы минуют события ORM - сбрасываем кэш пользователей вручную
+        principal_cache.invalidate(*written.values())
+
+    def _missing_condition(self, role: Role, external_ids: List[str]):
+        """Активные пользователи роли, которых нет во входящих external_id"""
+        incoming = func.unnest(
+            bindparam("incoming_ids", external_ids, type_=ARRAY(String))
+        ).table_valued("external_id").render_derived(name="incoming")
+
+        return and_(
+            User.archived == False,
+            exists().where(
+                user_roles.c.user_id == User.id,
+                user_roles.c.role_id == role.id
+            ),
+            ~exists().where(incoming.c.external_id == User.external_id)
+        )
+
+    def _archive_missing(self, db: Session, role: Role, external_ids: List[str]) -> int:
+        """
+        Архивация отсутствующих пользователей одним UPDATE ... WHERE NOT EXISTS
+        Входящие external_id передаются массивом и разворачиваются через unnest
+        """
+        try:
+            stmt = update(User).where(
+                self._missing_condition(role, external_ids)
+            ).values(
+                archived=True,
+                updated_at=datetime.now()
+            ).returning(User.id, User.display_name)
+
+            archived = db.execute(stmt).all()
             db.commit()
-            return len(missing_users)
+
+            for user_id, display_name in archived:
+                print(f"🚫 Архивирован: {display_name}")
+            principal_cache.invalidate(*(user_id for user_id, _ in archived))
+
+            return len(archived)
 
         except Exception as e:
             db.rollback()
             print(f"❌ Ошибка архивации: {e}")
             return 0
 
-    def _print_stats(self, stats: SyncStats):
+    def _print_stats(self, stats: SyncStats, baseline: SyncStats):
         """Вывод статистики"""
         print(f"\n📊 Синхронизация {self.role_name} завершена:")
-        print(f"   Добавлено: {stats.added}")
-        print(f"   Обновлено: {stats.updated}")
-        print(f"   Архивировано: {stats.archived}")
-        print(f"   Ошибок: {len(stats.errors)}")
+        print(f"   Добавлено: {stats.added - baseline.added}")
+        print(f"   Обновлено: {stats.updated - baseline.updated}")
+        print(f"   Без изменений: {stats.unchanged - baseline.unchanged}")
+        print(f"   Архивировано: {stats.archived - baseline.archived}")
+        print(f"   Ошибок: {len(stats.errors) - len(baseline.errors)}")
 
     # Абстрактные методы для реализации в дочерних классах
-    def _should_update_email(self, user: User, item: T) -> bool:
+    def _should_update_email(self, row: dict, item: T) -> bool:
         raise NotImplementedError
 
     def _get_item_email(self, item: T) -> str:
         raise NotImplementedError
 
-    def _update_specific_fields(self, user: User, item: T) -> bool:
+    def _diff_specific_fields(self, row: dict, item: T) -> dict:
         raise NotImplementedError
 
     def _get_specific_fields(self, item: T) -> dict:
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def _fingerprint_values(self, item: T) -> Optional[Sequence]:
+        return None
@@ -1,30 +1,17 @@
-import requests
-import mysql.connector
-from typing import List, Dict
-from mysql.connector import Error
+from typing import List, Dict, Any, Optional, Iterator
 from app.services.sync_service.schemas.sync_schemas import TeacherResponse, StudentResponse
-
-# Конфигурация
-MYSQL_CONFIG = {
-    'host': '192.168.20.61',
-    'database': 'students',
-    'user': 'pass_system',
-    'password': 'ktSXPOr2ekCGS4cr'
-}
-
+from app.core.config import settings
+from app.services.SchoolServices.school_db import school_db_pool
+from app.services.SchoolServices.teacher_roster import teacher_roster_cache
 
 def get_teachers_external() -> List[TeacherResponse]:
     """Получение данных учителей из внешнего API"""
     teachers = []
     try:
-        response = requests.get(
-            'https://school1298.ru/portal/workers/workersPS-no.json',
-            timeout=10
-        )
-        response.raise_for_status()
-        teachers_data = response.json()
+        # Сверка с порталом: при 304 используется уже разобранный список
+        roster = teacher_roster_cache.get(revalidate=True)
 
-        for teacher in teachers_data.get('value', []):
+        for teacher in roster.records:
             try:
                 # Пропускаем некорректные записи
                 if not teacher.get('Id') or teacher.get('email') in ['нет', 'e.a.kurakina@school1298.ru']:
@@ -59,58 +46,77 @@ def get_teachers_external() -> List[TeacherResponse]:
     return teachers
 
 
-def get_students_external() -> List[StudentResponse]:
-    """Получение данных учеников из внешней БД"""
-    students = []
-    connection = None
-    cursor = None
+def _students_query(since: Optional[Any] = None):
+    """SQL и параметры выборки учеников; since - нижняя граница колонки изменений"""
+    columns = "personid, email, firstName, lastName, patronymic, className"
+    conditions = "archive = 0"
+    params = ()
 
-    try:
-        connection = mysql.connector.connect(**MYSQL_CONFIG)
-        cursor = connection.cursor(dictionary=True)
+    watermark_column = settings.STUDENT_SYNC_WATERMARK_COLUMN
+    if watermark_column:
+        if not watermark_column.isidentifier():
+            raise ValueError(f"Некорректная колонка изменений: {watermark_column}")
+        columns += f", `{watermark_column}` AS watermark"
+        if since is not None:
+            conditions += f" AND `{watermark_column}` > %s"
+            params = (since,)
 
-        cursor.execute("""
-            SELECT personid, email, firstName, lastName, patronymic, className
-            FROM students 
-            WHERE archive = 0
-        """)
+    return f"SELECT {columns} FROM students WHERE {conditions}", params
 
-        for student in cursor.fetchall():
-            try:
-                if not student.get('personid'):
-                    continue
 
-                # Формируем display_name
-                first_name = student.get('firstName', '').strip()
-                last_name = student.get('lastName', '').strip()
-                patronymic = student.get('patronymic', '').strip()
-                display_name = f"{last_name} {first_name} {patronymic}".strip()
-
-                if not display_name:
-                    display_name = f"Ученик {student.get('personid')}"
-
-                students.append(StudentResponse(
-                    uid=str(student.get('personid')),
-                    display_name=display_name,
-                    email=student.get('email'),
-                    group_name=student.get('className'),
-                    first_name=first_name,
-                    last_name=last_name,
-                    patronymic=patronymic
-                ))
-
-            except Exception as e:
-                print(f"Ошибка обработки студента: {e}")
-                continue
+def _student_from_row(student: dict) -> Optional[StudentResponse]:
+    """Запись таблицы students -> StudentResponse (None для некорректных записей)"""
+    try:
+        if not student.get('personid'):
+            return None
+
+        # Формируем display_name
+        first_name = (student.get('firstName') or '').strip()
+        last_name = (student.get('lastName') or '').strip()
+        patronymic = (student.get('patronymic') or '').strip()
+        display_name = f"{last_name} {first_name} {patronymic}".strip()
+
+        if not display_name:
+            display_name = f"Ученик {student.get('personid')}"
+
+        return StudentResponse(
+            uid=str(student.get('personid')),
+            display_name=display_name,
+            email=student.get('email'),
+            group_name=student.get('className'),
+            first_name=first_name,
+            last_name=last_name,
+            patronymic=patronymic,
+            watermark=student.get('watermark')
+        )
 
-    except Error as e:
-        print(f"❌ Ошибка подключения к БД: {e}")
     except Exception as e:
-        print(f"❌ Ошибка получения студентов: {e}")
-    finally:
-        if cursor:
+        print(f"Ошибка обработки студента: {e}")
+        return None
+
+
+def iter_students_external(since: Optional[Any] = None,
+                           fetch_size: Optional[int] = None) -> Iterator[List[StudentResponse]]:
+    """
+    Потоковое чтение учеников из внешней БД пакетами по fetch_size
+    Небуферизованный курсор: строки читаются с сервера по мере обработки, память не растет с размером таблицы
+    Ошибки подключения и чтения пробрасываются - неполные данные нельзя использовать для архивации
+    """
+    fetch_size = fetch_size or settings.STUDENT_SYNC_FETCH_SIZE
+
+    with school_db_pool.connection() as connection:
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        try:
+            cursor.execute(*_students_query(since))
+
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+
+                chunk = [student for student in map(_student_from_row, rows) if student]
+                if chunk:
+                    yield chunk
+
+        finally:
             cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
-
-    return students
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Any, Dict, Iterator
 
 class TeacherResponse(BaseModel):
     uid: str
@@ -16,10 +16,51 @@ class StudentResponse(BaseModel):
     first_name: Optional[str] = None
     last_name: Optional[str] = None
     patronymic: Optional[str] = None
+    watermark: Optional[Any] = None  # значение колонки изменений в источнике
 
 class SyncStats(BaseModel):
+    processed: int = 0
     added: int = 0
     updated: int = 0
     archived: int = 0
+    unchanged: int = 0
     errors: List[str] = []
-    total_external: int = 0
\ No newline at end of file
+    total_external: int = 0
+
+
+class FieldChange(BaseModel):
+    old: Any = None
+    new: Any = None
+
+
+class SyncPlanEntry(BaseModel):
+    action: str  # add, update, archive
+    external_id: str
+    display_name: Optional[str] = None
+    email: Optional[str] = None
+    changes: Dict[str, FieldChange] = {}
+
+
+class SyncPlan(BaseModel):
+    """Изменения, которые внесет синхронизация (dry-run)"""
+    role: str
+    to_add: List[SyncPlanEntry] = []
+    to_update: List[SyncPlanEntry] = []
+    to_archive: List[SyncPlanEntry] = []
+    unchanged: int = 0
+    errors: List[str] = []
+
+    def summary(self) -> dict:
+        return {
+            "role": self.role,
+            "to_add": len(self.to_add),
+            "to_update": len(self.to_update),
+            "to_archive": len(self.to_archive),
+            "unchanged": self.unchanged,
+            "errors": len(self.errors),
+        }
+
+    def iter_ndjson(self) -> Iterator[str]:
+        """Построчный экспорт изменений: одна JSON-запись на строку"""
+        for entry in (*self.to_add, *self.to_update, *self.to_archive):
+            yield entry.model_dump_json() + "\n"
@@ -1,28 +1,89 @@
-from typing import List
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional, Any, Iterable, Iterator
 from sqlalchemy.orm import Session
-from app.services.sync_service.schemas.sync_schemas import StudentResponse, SyncStats
-from app.services.sync_service.base_sync_service import BaseSyncService
-from app.services.sync_service.external_services import get_students_external
+from app.core.config import settings
+from app.database.models import SyncState
+from app.services.sync_service.schemas.sync_schemas import StudentResponse, SyncStats, SyncPlan
+from app.services.sync_service.base_sync_service import BaseSyncService, is_aborting_error
+from app.services.sync_service.external_services import iter_students_external
 from app.auth.utils import get_password_hash
-from app.database.models import User, Role
+
+
+# Временный пароль новых учеников (requires_password: настоящий задается при регистрации)
+TEMPORARY_PASSWORD = "temporary_password_123"
+
+
+class WatermarkTracker:
+    """Максимум колонки изменений по мере чтения пакетов учеников"""
+
+    def __init__(self):
+        self.value = None
+
+    def track(self, chunks: Iterable[List[StudentResponse]]) -> Iterator[List[StudentResponse]]:
+        for chunk in chunks:
+            for student in chunk:
+                if student.watermark is not None and (self.value is None or student.watermark > self.value):
+                    self.value = student.watermark
+            yield chunk
 
 
 class StudentSyncService(BaseSyncService[StudentResponse]):
     """Сервис синхронизации учеников"""
 
+    specific_columns = ('group_name',)
+
     def __init__(self):
         super().__init__("student")
 
-    def sync_students(self, db: Session) -> SyncStats:
-        """Синхронизация учеников"""
-        students = get_students_external()
-        print(f"👨‍🎓 Найдено учеников: {len(students)}")
-        return self.sync(db, students)
-
-    def _should_update_email(self, user: User, student: StudentResponse) -> bool:
+    def sync_students(self, db: Session, incremental: bool = False, stats: Optional[SyncStats] = None,
+                      cancel_event: Optional[threading.Event] = None) -> SyncStats:
+        """
+        Синхронизация учеников
+        incremental=True - только записи, изменившиеся после сохраненного водяного знака
+        (без архивации; доступно, если задан STUDENT_SYNC_WATERMARK_COLUMN)
+        """
+        state = db.get(SyncState, self.role_name)
+        if incremental and not (settings.STUDENT_SYNC_WATERMARK_COLUMN and state and state.watermark):
+            print("⚠️  Нет водяного знака, выполняется полная синхронизация")
+            incremental = False
+        since = state.watermark if incremental else None
+
+        errors_before = len(stats.errors) if stats is not None else 0
+        tracker = WatermarkTracker()
+        chunks = tracker.track(iter_students_external(since=since))
+        stats = self.sync_chunks(db, chunks, not incremental, stats, cancel_event)
+        print(f"👨‍🎓 Найдено учеников: {stats.total_external}")
+
+        # Ошибки отдельных записей (например, нет email) не держат водяной знак:
+        # запись вернется в выборку, когда ее исправят в источнике
+        aborted = any(is_aborting_error(error) for error in stats.errors[errors_before:])
+        if settings.STUDENT_SYNC_WATERMARK_COLUMN and not aborted:
+            self._save_watermark(db, state, tracker.value)
+
+        return stats
+
+    def plan_students(self, db: Session) -> SyncPlan:
+        """Изменения полной синхронизации учеников без записи"""
+        return self.plan_chunks(db, iter_students_external())
+
+    def _save_watermark(self, db: Session, state: Optional[SyncState], watermark: Optional[Any]):
+        """Запоминает максимальное значение колонки изменений из прочитанных записей"""
+        if watermark is None:
+            return
+
+        if state is None:
+            state = SyncState(name=self.role_name)
+            db.add(state)
+        state.watermark = str(watermark)
+        state.updated_at = datetime.now()
+        db.commit()
+
+    def _should_update_email(self, row: dict, student: StudentResponse) -> bool:
         """Проверяет нужно ли обновлять email ученика"""
         external_email = self._get_external_email(student)
-        return external_email and external_email != user.email
+        return bool(external_email) and external_email != row['email']
 
     def _get_external_email(self, student: StudentResponse) -> str:
         """Получает email из внешней БД или генерирует новый если его нет"""
@@ -56,47 +117,28 @@ class StudentSyncService(BaseSyncService[StudentResponse]):
 
         return f"{base_email}@school1298.ru"
 
-    def _update_specific_fields(self, user: User, student: StudentResponse) -> bool:
-        """Обновление специфичных полей ученика"""
-        has_changes = False
+    def _diff_specific_fields(self, row: dict, student: StudentResponse) -> dict:
+        """Изменения специфичных полей ученика"""
+        changes = {}
 
-        if student.group_name and user.group_name != student.group_name:
-            user.group_name = student.group_name
-            has_changes = True
-            print(f"📚 Изменена группа: {user.display_name} -> {student.group_name}")
+        if student.group_name and row['group_name'] != student.group_name:
+            changes['group_name'] = student.group_name
 
-        return has_changes
+        return changes
+
+    def _fingerprint_values(self, student: StudentResponse) -> tuple:
+        """Поля ученика, изменение которых требует обновления пользователя"""
+        return student.display_name, self._get_external_email(student), student.group_name
+
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _temporary_password_hash() -> str:
+        """Один хеш временного пароля на процесс: пароль задается при регистрации"""
+        return get_password_hash(TEMPORARY_PASSWORD)
 
     def _get_specific_fields(self, student: StudentResponse) -> dict:
         """Получение специфичных полей для нового ученика"""
         return {
             'group_name': student.group_name,
-            'password_hash': get_password_hash("temporary_password_123")
+            'password_hash': self._temporary_password_hash()
         }
-
-    def _process_single_item(self, db: Session, student: StudentResponse, role: Role, stats: SyncStats):
-        """Обработка одного ученика с улучшенным логированием"""
-        try:
-            existing_user = db.query(User).filter(User.external_id == student.uid).first()
-
-            if existing_user:
-                if self._update_item(existing_user, student, role):
-                    stats.updated += 1
-
-                    # Детальное логирование изменений
-                    external_email = self._get_external_email(student)
-                    if external_email and external_email != existing_user.email:
-                        print(f"📧 Обновлен email: {student.display_name} -> {external_email}")
-                    else:
-                        print(f"🔄 Обновлен: {student.display_name} -> {student.email}{external_email}")
-                        print(f"🔄 Обновлен: {student.display_name}")
-            else:
-                self._add_item(db, student, role)
-                stats.added += 1
-                db.commit()
-                email = self._get_external_email(student)
-                print(f"✅ Добавлен: {student.display_name} ({email})")
-
-        except Exception as e:
-            stats.errors.append(f"{student.display_name}: {str(e)}")
-            print(f"❌ Ошибка: {student.display_name} - {e}")
\ No newline at end of file
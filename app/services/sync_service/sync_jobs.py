@@ -0,0 +1,217 @@
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.database import engine, SessionLocal
+from app.services.sync_service.base_sync_service import CRITICAL_ERROR_PREFIX
+from app.services.sync_service.schemas.sync_schemas import SyncStats
+from app.services.sync_service.student_sync_service import StudentSyncService
+from app.services.sync_service.teacher_sync_service import TeacherSyncService
+from app.services.sync_service.unified_sync_service import UnifiedSyncService
+
+# Ключ pg_advisory_lock: одна синхронизация на все процессы/воркеры
+SYNC_ADVISORY_LOCK_KEY = 1298_0001
+
+# Сколько завершенных задач хранить для просмотра
+JOB_HISTORY_SIZE = 50
+
+
+class SyncJobConflict(Exception):
+    """Синхронизация уже выполняется"""
+
+
+class SyncJob:
+    """Фоновая задача синхронизации"""
+
+    def __init__(self, kind: str, incremental: bool = False):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.incremental = incremental
+        self.status = "pending"  # pending, running, completed, failed, cancelled
+        self.stats = SyncStats()
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.cancel_event = threading.Event()
+        self.done = threading.Event()
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("pending", "running")
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "incremental": self.incremental,
+            "status": self.status,
+            "stats": self.stats.model_dump(),
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+def _run_teachers(db: Session, job: SyncJob) -> SyncStats:
+    return TeacherSyncService().sync_teachers(db, stats=job.stats, cancel_event=job.cancel_event)
+
+
+def _run_students(db: Session, job: SyncJob) -> SyncStats:
+    return StudentSyncService().sync_students(
+        db, incremental=job.incremental, stats=job.stats, cancel_event=job.cancel_event
+    )
+
+
+def _run_all(db: Session, job: SyncJob) -> SyncStats:
+    return UnifiedSyncService.sync_all(
+        db, incremental=job.incremental, stats=job.stats, cancel_event=job.cancel_event
+    )
+
+
+class SyncJobManager:
+    """
+    Запуск синхронизаций в фоновых потоках
+    Внутри процесса одновременно выполняется одна задача (lock),
+    между процессами - pg_try_advisory_lock на отдельном соединении
+    """
+
+    runners: Dict[str, Callable[[Session, SyncJob], SyncStats]] = {
+        "teachers": _run_teachers,
+        "students": _run_students,
+        "all": _run_all,
+    }
+
+    def __init__(self, history_size: int = JOB_HISTORY_SIZE):
+        self._history_size = history_size
+        self._jobs: "OrderedDict[str, SyncJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, kind: str, incremental: bool = False) -> SyncJob:
+        """Запуск задачи; SyncJobConflict, если другая задача еще выполняется"""
+        if kind not in self.runners:
+            raise ValueError(f"Неизвестный тип синхронизации: {kind}")
+
+        with self._lock:
+            active = self._active_job()
+            if active:
+                raise SyncJobConflict(f"Синхронизация {active.kind} уже выполняется ({active.id})")
+
+            job = SyncJob(kind, incremental)
+            self._jobs[job.id] = job
+            while len(self._jobs) > self._history_size:
+                oldest_id = next(iter(self._jobs))
+                if self._jobs[oldest_id].is_active:
+                    break
+                self._jobs.pop(oldest_id)
+
+        thread = threading.Thread(target=self._run, args=(job,), name=f"sync-{kind}", daemon=True)
+        thread.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[SyncJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[SyncJob]:
+        return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> Optional[SyncJob]:
+        """Остановка задачи между пакетами записи"""
+        job = self._jobs.get(job_id)
+        if job and job.is_active:
+            job.cancel_event.set()
+        return job
+
+    def _active_job(self) -> Optional[SyncJob]:
+        return next((job for job in self._jobs.values() if job.is_active), None)
+
+    def _run(self, job: SyncJob):
+        job.status = "running"
+        job.started_at = datetime.now()
+
+        try:
+            with engine.connect() as connection:
+                acquired = connection.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": SYNC_ADVISORY_LOCK_KEY}
+                ).scalar()
+                connection.commit()
+
+                if not acquired:
+                    job.status = "failed"
+                    job.error = "Синхронизация уже выполняется в другом процессе"
+                    return
+
+                # Сессия на том же соединении: advisory lock живет до освобождения ниже
+                db = SessionLocal(bind=connection)
+                try:
+                    self.runners[job.kind](db, job)
+                finally:
+                    db.close()
+                    connection.execute(
+                        text("SELECT pg_advisory_unlock(:key)"), {"key": SYNC_ADVISORY_LOCK_KEY}
+                    )
+                    connection.commit()
+
+            if job.cancel_event.is_set():
+                job.status = "cancelled"
+            elif any(error.startswith(CRITICAL_ERROR_PREFIX) for error in job.stats.errors):
+                job.status = "failed"
+                job.error = job.stats.errors[-1]
+            else:
+                job.status = "completed"
+
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"❌ Ошибка задачи синхронизации {job.kind}: {e}")
+
+        finally:
+            job.finished_at = datetime.now()
+            job.done.set()
+
+
+class SyncScheduler:
+    """Периодический запуск синхронизаций внутри процесса (SYNC_SCHEDULE_INTERVAL_MINUTES, 0 - выключено)"""
+
+    def __init__(self, manager: SyncJobManager):
+        self._manager = manager
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        interval = settings.SYNC_SCHEDULE_INTERVAL_MINUTES
+        if interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval * 60,), name="sync-scheduler", daemon=True)
+        self._thread.start()
+        print(f"⏰ Плановая синхронизация каждые {interval} мин.: {settings.SYNC_SCHEDULE_KINDS}")
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, interval_seconds: float):
+        while not self._stop.wait(interval_seconds):
+            for kind in [kind.strip() for kind in settings.SYNC_SCHEDULE_KINDS.split(",") if kind.strip()]:
+                if self._stop.is_set():
+                    return
+                try:
+                    job = self._manager.start(kind)
+                except (SyncJobConflict, ValueError) as e:
+                    print(f"⏰ Плановая синхронизация {kind} пропущена: {e}")
+                    continue
+                # Задачи выполняются по очереди, пока не будет остановки
+                while not job.done.wait(1) and not self._stop.is_set():
+                    pass
+
+
+sync_job_manager = SyncJobManager()
+sync_scheduler = SyncScheduler(sync_job_manager)
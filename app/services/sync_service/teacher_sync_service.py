@@ -1,25 +1,52 @@
-from app.services.sync_service.base_sync_service import BaseSyncService
+import threading
+from typing import List, Optional
+from app.services.sync_service.base_sync_service import BaseSyncService, CRITICAL_ERROR_PREFIX
 from app.services.sync_service.external_services import get_teachers_external
-from app.services.sync_service.schemas.sync_schemas import TeacherResponse, SyncStats
+from app.services.sync_service.schemas.sync_schemas import TeacherResponse, SyncStats, SyncPlan
 from sqlalchemy.orm import Session
-from app.database.models import User, Role
+
+EMPTY_ROSTER_ERROR = f"{CRITICAL_ERROR_PREFIX}: не получены данные учителей"
 
 
 class TeacherSyncService(BaseSyncService[TeacherResponse]):
     """Сервис синхронизации учителей"""
 
+    specific_columns = ('image', 'groups_leader')
+
     def __init__(self):
         super().__init__("teacher")
 
-    def sync_teachers(self, db: Session) -> SyncStats:
+    def sync_teachers(self, db: Session, stats: Optional[SyncStats] = None,
+                      cancel_event: Optional[threading.Event] = None) -> SyncStats:
         """Синхронизация учителей"""
         teachers = get_teachers_external()
         print(f"👨‍🏫 Найдено учителей: {len(teachers)}")
-        return self.sync(db, teachers)
+        return self.sync_roster(db, teachers, stats=stats, cancel_event=cancel_event)
+
+    def sync_roster(self, db: Session, teachers: List[TeacherResponse], stats: Optional[SyncStats] = None,
+                    cancel_event: Optional[threading.Event] = None) -> SyncStats:
+        """
+        Синхронизация загруженного списка учителей
+        Пустой ответ портала - ошибка загрузки, иначе архивировались бы все учителя
+        """
+        stats = stats if stats is not None else SyncStats()
+        if not teachers:
+            stats.errors.append(EMPTY_ROSTER_ERROR)
+            return stats
+        return self.sync(db, teachers, stats=stats, cancel_event=cancel_event)
+
+    def plan_teachers(self, db: Session) -> SyncPlan:
+        """Изменения синхронизации учителей без записи"""
+        teachers = get_teachers_external()
+        if not teachers:
+            plan = SyncPlan(role=self.role_name)
+            plan.errors.append(EMPTY_ROSTER_ERROR)
+            return plan
+        return self.plan(db, teachers)
 
-    def _should_update_email(self, user: User, teacher: TeacherResponse) -> bool:
+    def _should_update_email(self, row: dict, teacher: TeacherResponse) -> bool:
         """Проверяет нужно ли обновлять email учителя"""
-        return teacher.email and user.email != teacher.email
+        return bool(teacher.email) and row['email'] != teacher.email
 
     def _get_item_email(self, teacher: TeacherResponse) -> str:
         """Получает email учителя"""
@@ -27,21 +54,17 @@ class TeacherSyncService(BaseSyncService[TeacherResponse]):
             raise ValueError("У учителя отсутствует email")
         return teacher.email
 
-    def _update_specific_fields(self, user: User, teacher: TeacherResponse) -> bool:
-        """Обновление специфичных полей учителя"""
-        has_changes = False
+    def _diff_specific_fields(self, row: dict, teacher: TeacherResponse) -> dict:
+        """Изменения специфичных полей учителя"""
+        changes = {}
 
-        if teacher.image != user.image:
-            user.image = teacher.image
-            has_changes = True
-            print(f"🖼️  Обновлено фото: {user.display_name}")
+        if teacher.image != row['image']:
+            changes['image'] = teacher.image
 
-        if teacher.leader_groups != user.groups_leader:
-            user.groups_leader = teacher.leader_groups
-            has_changes = True
-            print(f"👥 Изменены классы руководства: {user.display_name} -> {teacher.leader_groups}")
+        if teacher.leader_groups != row['groups_leader']:
+            changes['groups_leader'] = teacher.leader_groups
 
-        return has_changes
+        return changes
 
     def _get_specific_fields(self, teacher: TeacherResponse) -> dict:
         """Получение специфичных полей для нового учителя"""
@@ -49,27 +72,3 @@ class TeacherSyncService(BaseSyncService[TeacherResponse]):
             'image': teacher.image,
             'groups_leader': teacher.leader_groups
         }
-
-    def _process_single_item(self, db: Session, teacher: TeacherResponse, role: Role, stats: SyncStats):
-        """Обработка одного учителя с улучшенным логированием"""
-        try:
-            existing_user = db.query(User).filter(User.external_id == teacher.uid).first()
-
-            if existing_user:
-                if self._update_item(existing_user, teacher, role):
-                    stats.updated += 1
-
-                    # Детальное логирование изменений для учителей
-                    if teacher.email and teacher.email != existing_user.email:
-                        print(f"📧 Обновлен email учителя: {teacher.display_name} -> {teacher.email}")
-                    else:
-                        print(f"🔄 Обновлен учитель: {teacher.display_name}")
-            else:
-                self._add_item(db, teacher, role)
-                stats.added += 1
-                db.commit()
-                print(f"✅ Добавлен учитель: {teacher.display_name} ({teacher.email})")
-
-        except Exception as e:
-            stats.errors.append(f"{teacher.display_name}: {str(e)}")
-            print(f"❌ Ошибка учителя: {teacher.display_name} - {e}")
\ No newline at end of file
@@ -0,0 +1,38 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.services.sync_service.external_services import get_teachers_external
+from app.services.sync_service.schemas.sync_schemas import SyncStats
+from app.services.sync_service.student_sync_service import StudentSyncService
+from app.services.sync_service.teacher_sync_service import TeacherSyncService
+
+
+class UnifiedSyncService:
+    """Полная синхронизация учителей и учеников"""
+
+    @staticmethod
+    def sync_all(db: Session, incremental: bool = False, stats: Optional[SyncStats] = None,
+                 cancel_event: Optional[threading.Event] = None) -> SyncStats:
+        """
+        Учителя загружаются с портала в отдельном потоке, пока ученики читаются из MySQL и записываются;
+        затем записываются учителя. Время - max(), а не сумма двух загрузок
+        Возвращает общую статистику по обеим ролям
+        """
+        stats = stats if stats is not None else SyncStats()
+        teacher_service = TeacherSyncService()
+        student_service = StudentSyncService()
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="sync-teachers-fetch") as executor:
+            teachers_future = executor.submit(get_teachers_external)
+            student_service.sync_students(db, incremental=incremental, stats=stats, cancel_event=cancel_event)
+            teachers = teachers_future.result()
+
+        print(f"👨‍🏫 Найдено учителей: {len(teachers)}")
+        if cancel_event is not None and cancel_event.is_set():
+            return stats
+
+        teacher_service.sync_roster(db, teachers, stats=stats, cancel_event=cancel_event)
+        return stats
@@ -56,7 +56,7 @@ class UserService:
 
     @staticmethod
     def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-        """Аутентификация пользователя"""
+        """Аутентификация пользователя (проверка пароля - в пуле хеширования, PasswordHashingBusy при перегрузке)"""
         user = db.query(User).filter(User.email == email).first()
         print(user)
         if not user:
@@ -0,0 +1,137 @@
+"""
+Замер сборки pivot-данных проектного офиса (_build_pivot) на синтетических строках
+Сравнивает с прежней реализацией (поиск стадии по названию в списке стадий мероприятия)
+
+    python tests/bench_pivot.py [учеников] [мероприятий] [стадий]
+
+По умолчанию 1000 x 20 x 8 (160 тыс. строк), как в выборке крупной параллели
+"""
+import gc
+import os
+import sys
+import time
+from collections import defaultdict, namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name, value in {"DB_HOST": "localhost", "DB_PORT": "5432", "DB_NAME": "bench",
+                    "DB_USER": "bench", "DB_PASSWORD": "bench", "SECRET_KEY": "bench"}.items():
+    os.environ.setdefault(name, value)
+
+from app.routes.project_office import _build_pivot
+
+Row = namedtuple("Row", [
+    "student_id", "display_name", "group_name", "event_id", "event_title", "min_stages_for_completion",
+    "stage_id", "stage_title", "min_score_for_finished", "points_for_done",
+])
+
+REPEATS = 5
+DEFAULT_SIZES = [1000, 20, 8]
+
+
+def make_rows(students: int, events: int, stages: int) -> list:
+    """Строки в порядке запроса: ученик, мероприятие, стадия"""
+    rows = []
+    for student_id in range(1, students + 1):
+        for event_id in range(1, events + 1):
+            for stage_order in range(stages):
+                stage_id = event_id * 1000 + stage_order
+                rows.append(Row(
+                    student_id, f"Ученик {student_id}", f"{10 + student_id % 2}-{student_id % 8}",
+                    event_id, f"Мероприятие {event_id}", stages // 2,
+                    stage_id, f"Этап {stage_order + 1}", 5, (student_id + stage_id) % 11,
+                ))
+    return rows
+
+
+def legacy_build_pivot(rows) -> list:
+    """Реализация до перехода на словари по id (для сравнения)"""
+    result_map = defaultdict(lambda: {
+        "id": None,
+        "student_name": None,
+        "group_name": None,
+        "class_teacher": None,
+        "events": defaultdict(lambda: {
+            "event_name": None,
+            "total_score": 0,
+            "completed_stages_count": 0,
+            "min_stages_required": 0,
+            "stages": [],
+            "status": "не начато"
+        })
+    })
+    event_min_requirements = {}
+
+    for row in rows:
+        student_key = row.student_id
+        event_key = str(row.event_id)
+
+        if result_map[student_key]["id"] is None:
+            result_map[student_key].update({
+                "id": row.student_id,
+                "student_name": row.display_name or f"Ученик {row.student_id}",
+                "group_name": row.group_name,
+            })
+
+        event_data = result_map[student_key]["events"][event_key]
+        if event_data["event_name"] is None:
+            event_data.update({
+                "event_name": row.event_title,
+                "min_stages_required": row.min_stages_for_completion or 0
+            })
+            event_min_requirements[event_key] = row.min_stages_for_completion or 0
+
+        current_score = row.points_for_done or 0
+        status = "зачет" if current_score >= (row.min_score_for_finished or 0) else "незачет"
+
+        stage_exists = any(stage.get("name") == row.stage_title for stage in event_data["stages"])
+        if not stage_exists:
+            event_data["stages"].append({
+                "name": row.stage_title,
+                "status": status,
+                "current_score": current_score
+            })
+            event_data["total_score"] += current_score
+            if status == "зачет":
+                event_data["completed_stages_count"] += 1
+
+    for student_data in result_map.values():
+        for event_key, event_data in student_data["events"].items():
+            min_required = event_min_requirements.get(event_key, len(event_data["stages"]))
+            if event_data["completed_stages_count"] >= min_required:
+                event_data["status"] = "зачет"
+            elif event_data["total_score"] > 0:
+                event_data["status"] = "в процессе"
+            student_data["events"][event_key] = dict(event_data)
+        student_data["events"] = dict(student_data["events"])
+
+    return list(result_map.values())
+
+
+def best_times(builds, rows) -> list:
+    """Лучшее время каждой реализации; запуски чередуются, мусор собирается перед каждым"""
+    timings = [[] for _ in builds]
+    for _ in range(REPEATS):
+        for build, build_timings in zip(builds, timings):
+            gc.collect()
+            started = time.perf_counter()
+            build(rows)
+            build_timings.append(time.perf_counter() - started)
+    return [min(build_timings) for build_timings in timings]
+
+
+def main():
+    sizes = [int(value) for value in sys.argv[1:4]]
+    students, events, stages = sizes + DEFAULT_SIZES[len(sizes):]
+    rows = make_rows(students, events, stages)
+
+    # Названия стадий уникальны в мероприятии - результаты обеих реализаций совпадают
+    assert _build_pivot(rows) == legacy_build_pivot(rows)
+
+    legacy, current = best_times([legacy_build_pivot, _build_pivot], rows)
+    print(f"{students} x {events} x {stages} ({len(rows)} строк), лучшее из {REPEATS}:")
+    print(f"  до:    {legacy:.3f} с")
+    print(f"  после: {current:.3f} с ({legacy / current:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
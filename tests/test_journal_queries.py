@@ -0,0 +1,68 @@
+from datetime import date
+
+import pytest
+
+from app.database.models import Achievement, Event, EventType, Group, PossibleResult, Stage, User
+from app.routes.dailary import get_class_journal
+
+
+def _create_class(db, class_size: int) -> tuple:
+    """Мероприятие с тремя стадиями и класс из class_size учеников с результатами"""
+    teacher = User(external_id="t-1", email="teacher@school.test", display_name="Учитель")
+    group = Group(name="10А")
+    event_type = EventType(title="Олимпиада", min_stages_for_completion=2)
+    db.add_all([teacher, group, event_type])
+    db.flush()
+
+    event = Event(title="Олимпиада 2025", event_type_id=event_type.id, date_start=date(2025, 9, 1))
+    db.add(event)
+
+    stages = []
+    for order in range(3):
+        stage = Stage(event_type_id=event_type.id, title=f"Этап {order + 1}", stage_order=order, min_score_for_finished=5)
+        stage.possible_results = [
+            PossibleResult(title="Участник", points_for_done=3),
+            PossibleResult(title="Призер", points_for_done=10),
+        ]
+        stages.append(stage)
+    db.add_all(stages)
+
+    students = [
+        User(external_id=f"s-{index}", email=f"student{index}@school.test",
+             display_name=f"Ученик {index}", group_name=group.name, archived=False)
+        for index in range(class_size)
+    ]
+    db.add_all(students)
+    db.flush()
+
+    for index, student in enumerate(students):
+        for stage in stages[:index % len(stages) + 1]:
+            db.add(Achievement(
+                teacher_id=teacher.id,
+                student_id=student.id,
+                event_id=event.id,
+                stage_id=stage.id,
+                result_id=stage.possible_results[index % 2].id,
+            ))
+    ids = event.id, group.id
+    db.commit()
+    # Журнал читает все заново, а не из identity map теста
+    db.expunge_all()
+    return ids
+
+
+def _journal_query_count(db, count_queries, class_size: int) -> int:
+    event_id, group_id = _create_class(db, class_size)
+
+    with count_queries() as queries:
+        journal = get_class_journal(event_id=event_id, group_id=str(group_id), db=db, current_user=None)
+
+    assert len(journal) == class_size
+    assert all(len(row.stages) == 3 for row in journal)
+    return len(queries)
+
+
+@pytest.mark.parametrize("class_size", [3, 30])
+def test_class_journal_query_count_is_constant(db, count_queries, class_size):
+    """Журнал класса: фиксированное число запросов, без N+1 по ученикам и стадиям"""
+    assert _journal_query_count(db, count_queries, class_size) == 5
@@ -0,0 +1,124 @@
+import os
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.database.models import (
+    Achievement, Event, EventType, Group, PossibleResult, ProjectOffice, Stage, User,
+    p_office_event_association, p_office_group_association,
+)
+from app.routes.project_office import (
+    _aggregated_pivot, _build_pivot, _pivot_aggregated_query, _pivot_rows_query, _pivot_stage_rows_query,
+)
+
+# aggregation=sql использует jsonb-функции PostgreSQL: полное сравнение режимов - только на нем
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+def _create_office(db) -> int:
+    """Офис с двумя классами и двумя мероприятиями; связи класса и мероприятия продублированы"""
+    teacher = User(external_id="t-1", email="teacher@school.test", display_name="Учитель")
+    groups = [Group(name="10А"), Group(name="10Б")]
+    event_type = EventType(title="Олимпиада", min_stages_for_completion=2)
+    db.add_all([teacher, event_type, *groups])
+    db.flush()
+
+    office = ProjectOffice(title="Офис", leader_uid=teacher.id)
+    events = [
+        Event(title=f"Олимпиада {index}", event_type_id=event_type.id, date_start=date(2025, 9, 1), is_active=True)
+        for index in range(2)
+    ]
+    stages = []
+    for order in range(3):
+        stage = Stage(event_type_id=event_type.id, title=f"Этап {order + 1}", stage_order=order, min_score_for_finished=5)
+        stage.possible_results = [
+            PossibleResult(title="Участник", points_for_done=3),
+            PossibleResult(title="Призер", points_for_done=10),
+        ]
+        stages.append(stage)
+    db.add_all([office, *events, *stages])
+    db.flush()
+
+    # Повторные связи дают повторные строки (ученик, мероприятие, стадия) в join
+    db.execute(insert(p_office_group_association), [
+        {"p_office_id": office.id, "group_id": groups[0].id},
+        {"p_office_id": office.id, "group_id": groups[0].id},
+        {"p_office_id": office.id, "group_id": groups[1].id},
+    ])
+    db.execute(insert(p_office_event_association), [
+        {"p_office_id": office.id, "event_id": events[0].id},
+        {"p_office_id": office.id, "event_id": events[1].id},
+        {"p_office_id": office.id, "event_id": events[1].id},
+    ])
+
+    students = [
+        User(external_id=f"s-{index}", email=f"student{index}@school.test",
+             display_name=f"Ученик {index}", group_name=groups[index % 2].name, archived=False)
+        for index in range(6)
+    ]
+    db.add_all(students)
+    db.flush()
+
+    for index, student in enumerate(students):
+        for event in events[:index % 2 + 1]:
+            for stage in stages[:index % len(stages) + 1]:
+                db.add(Achievement(
+                    teacher_id=teacher.id,
+                    student_id=student.id,
+                    event_id=event.id,
+                    stage_id=stage.id,
+                    result_id=stage.possible_results[index % 2].id,
+                ))
+    office_id = office.id
+    db.flush()
+    return office_id
+
+
+def _stage_summary(pivot: list) -> dict:
+    return {
+        (student["id"], event_id): [(stage["name"], stage["status"], stage["current_score"]) for stage in event["stages"]]
+        for student in pivot
+        for event_id, event in student["events"].items()
+    }
+
+
+def test_sql_stage_rows_match_python_pivot(db):
+    """Стадии, которые агрегирует PostgreSQL, совпадают со стадиями Python-сборки: без повторов"""
+    office_id = _create_office(db)
+
+    python_pivot = _build_pivot(db.execute(_pivot_rows_query(office_id, None)).all())
+
+    stage_rows = sorted(
+        db.execute(_pivot_stage_rows_query(office_id, None)).all(),
+        key=lambda row: (row.student_id, row.event_id, row.stage_order, row.stage_id)
+    )
+    sql_stages = {}
+    for row in stage_rows:
+        sql_stages.setdefault((row.student_id, str(row.event_id)), []).append(
+            (row.stage_title, "зачет" if row.is_completed else "незачет", row.current_score)
+        )
+
+    assert _stage_summary(python_pivot) == sql_stages
+    assert all(len(stages) == 3 for stages in sql_stages.values())
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL не задан")
+def test_pivot_modes_return_same_data():
+    engine = create_engine(POSTGRES_URL)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            Base.metadata.create_all(connection)
+            db = Session(bind=connection)
+            office_id = _create_office(db)
+
+            python_pivot = _build_pivot(db.execute(_pivot_rows_query(office_id, None)).all())
+            sql_pivot = _aggregated_pivot(db.execute(_pivot_aggregated_query(office_id, None)).all())
+
+            assert sql_pivot == python_pivot
+        finally:
+            transaction.rollback()
+    engine.dispose()